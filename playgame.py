@@ -1,17 +1,23 @@
 import random
 import os
 import copy
+import math
 
 import time
+import hashlib
+import json
+import contextlib
+import cProfile
+import pstats
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import numpy as np
-from tensorflow.keras.models import Sequential # type: ignore
-from tensorflow.keras.layers import Conv2D, Flatten, Dense, Reshape, Input # type: ignore
-from tensorflow.keras.initializers import HeNormal # type: ignore
-from tensorflow.keras.regularizers import l2 # type: ignore
 import matplotlib.pyplot as plt
 import pickle
 
+# Board size and fleet of the standard game, use_game_config switches the whole program to another GameConfig
 GRID_SIZE = 10
 SHIPS_SIZES = {"aircraft carrier": 5, 
               "battleship": 4, 
@@ -19,28 +25,80 @@ SHIPS_SIZES = {"aircraft carrier": 5,
               "submarine": 3, 
               "destroyer": 2}
 SHIPS_NAMES = ["aircraft carrier", "battleship", "cruiser", "submarine", "destroyer"]
-STR_TO_INT = {"A":0,"B":1,"C":2,"D":3,"E":4,"F":5,"G":6,"H":7,"I":8,"J":9}
-INT_TO_STR = {0:"A",1:"B",2:"C",3:"D",4:"E",5:"F",6:"G",7:"H",8:"I",9:"J"}
+PLAY_GRID_SIZE = GRID_SIZE # Board size of the games played, benchmarked and trained on (e.g. 20 or 50 for stress tests)
+PLAY_SHIPS_SIZES = SHIPS_SIZES # Fleet of those games, {ship name: size} in placement order
 PIECE_CHAR = '#'
 NREPS = 1 # Number of times an algorithm tests on a sample board if testing is selected
 
 H_NREPS = 5000 # Number of sims for get_heatmap (more = more accurate heatmap). Used in heatmap & NN moves.
+ANCHOR_CANDIDATES = 4 # Random anchors drawn per board per round of the batched get_heatmap sampler
+HEATMAP_MODE = "sampled" # "sampled" simulates H_NREPS boards, "exact" counts every ship layout that fits the board
+EXACT_MAX_STATES = 100000 # Most partial layouts the exact heatmap may need, more open boards are sampled (exact covers 1-2 ships left and about half of 3)
+HEATMAP_BATCH = 500 # Boards simulated per step when best_move refines a heatmap until its deadline
+UCT_ROLLOUTS = 100 # Rollouts per move of the tree search (UCT) mcts player
+UCT_TIME = None # Seconds per move of the UCT player, if set it stops early when time runs out (moves then depend on speed)
+UCT_HORIZON = 20 # Shots simulated from the current board in each rollout, the reward is the share of them that hit
+UCT_CANDIDATES = 8 # Cells with the best shot_scores the tree considers at each board
+UCT_EXPLORATION = 0.5 # Exploration constant of the UCT selection
+TARGET_WEIGHT = 10 # Extra weight of placements through unsunk hits in shot_scores
+HEATMAP_CACHE_BYTES = 64 << 20 # Most bytes of heatmaps get_heatmap keeps for repeated positions (0 turns the cache off)
+OPENING_BOOK_FILE = "OpeningBook" # Opening book made by build_opening_book, loaded at startup if it exists (other game configs add their suffix)
+BUILD_OPENING_BOOK = False # Build the opening book and save it to OPENING_BOOK_FILE instead of the menus
+BOOK_DEPTH = 10 # Moves from the empty board the opening book covers (every hit/miss result of the book moves)
+BOOK_NREPS = 20000 # Number of sims for each opening book heatmap
 NN_NREPS = 0 # Number of new samples for NN training and validation
 GENERATE_DATA = False  # Generate more samples for NN training and validation
+DATA_WORKERS = os.cpu_count() # Number of processes generating NN samples
+DATA_CHUNK = 50 # Samples per task sent to a data worker, each task writes its own shard
 EPOCHS = 50 # Number of epochs for neural network
-
-"""GLOBAL VARIABLES FOR HUMAN AI"""
-rowNum = 0
-colNum = 0
-targetStack = []
-hitMarkers = []
-targetMode = False
-destroyMode = False
-clearHitMarkers = False
-humanSimSunkResult = ""
-probableHuman = False #boolean variable. True is to do probability strat and false is to do even strat
-removeFromStackCount = int
-isAppended = False
+NN_CONFIG = {"conv_filters": 25, "conv_kernel": 5, "l2": 0.01, "optimizer": "adam", "loss": "binary_crossentropy"} # NN layer and training settings
+MODEL_DIR = "models" # Trained NN models are saved here, named by network_key
+NN_DATA_DIR = "NeuralNetworkShards" # NN training data, every generate_data run adds one shard of .npy arrays (other game configs add their suffix)
+TRAIN_BATCH_SIZE = 32 # Samples per training step when streaming the shards
+
+BENCHMARK = False # Run a non-interactive benchmark of BENCHMARK_AI_TYPES instead of the menus
+BENCHMARK_AI_TYPES = [1, 2, 3, 4, 6] # choose_AI_type menu numbers to benchmark
+BENCHMARK_GAMES = 1000 # Number of games each AI type plays in the benchmark
+BENCHMARK_WORKERS = os.cpu_count() # Number of processes playing games (test mode uses this too)
+BENCHMARK_SEED = 0 # Base seed, every chunk of games gets its own seed derived from it
+BENCHMARK_CHUNK = 25 # Games per task sent to a worker process
+NN_BATCH_GAMES = 256 # Games the NN player steps together in a benchmark task, one network call per move for all of them
+PROFILE = False # Time the phases of every benchmarked AI move (see Profiler), printed and saved to PROFILE_DIR
+PROFILE_FORMAT = "json" # "json" saves the phase stats, "chrome" a Chrome trace of every timed phase (chrome://tracing)
+PROFILE_MAX_EVENTS = 200000 # Most timed phases a benchmark worker keeps for the Chrome trace
+CPROFILE = False # Also run the benchmark workers under cProfile, the merged stats are saved to PROFILE_DIR
+PROFILE_DIR = "profiles" # Profiles of the benchmark of AI type n are saved as benchmark-<n>.json / .trace.json / .prof
+
+BENCHMARK_SUITE = False # Run the benchmark suite (SUITE_AI_TYPES on the layout corpus) and check it against the baseline
+SUITE_AI_TYPES = [1, 2, 3, 4, 5, 6, 7] # choose_AI_type menu numbers the suite plays, every gen_AI_move strategy
+CORPUS_FILE = "BenchmarkCorpus" # Fleet layouts every suite run plays, made once per CORPUS_VERSION (other game configs add their suffix)
+CORPUS_VERSION = 1 # Bump to draw a new corpus, results on different corpora are never compared
+CORPUS_SIZE = 200 # Number of layouts in the corpus
+SUITE_RESULTS_FILE = "BenchmarkResults.jsonl" # Every suite run appends one JSON line, keyed by git revision, game config and corpus
+SUITE_BASELINE_FILE = "BenchmarkBaseline" # Suite run regressions are checked against (.json, other game configs add their suffix)
+UPDATE_BASELINE = False # Save the suite run as the new baseline (the first run of a corpus always is)
+STRENGTH_TOLERANCE = 0.02 # Flag a strength regression when the mean moves to win grow by more than this share of the baseline's
+SPEED_TOLERANCE = 0.25 # Flag a speed regression when the p50 or p95 move latency grows by more than this share of the baseline's
+SPEED_FLOOR_MS = 0.05 # Latency growth under this many ms is never flagged (timer noise on the fastest strategies)
+
+TOURNAMENT = False # Play every pair of TOURNAMENT_AI_TYPES against each other instead of the menus
+TOURNAMENT_AI_TYPES = [1, 2, 3, 4, 5, 6] # choose_AI_type menu numbers in the tournament
+TOURNAMENT_GAMES = 2000 # Games per pair of AI types, in mirrored pairs on shared layouts
+TOURNAMENT_SEED = 0 # Seed of the tournament's layouts and games
+
+VECTOR_BENCHMARK = False # Play VECTOR_GAMES games of each batched strategy in a VectorEnv instead of the menus
+VECTOR_BENCHMARK_STRATEGIES = ["random", "probability", "heatmap"] # VECTOR_STRATEGIES names to benchmark
+VECTOR_GAMES = 10000 # Games stepped together in one VectorEnv
+VECTOR_PARITY_GAMES = 200 # Seeded layouts the vector benchmark also plays one board at a time, the batched moves must be the same
+
+# choose_AI_type menu number: (description, gen_AI_move style_choice)
+AI_TYPES = {1: ("Random moves", 1),
+            2: ("Simulated player (even strategy)", 2),
+            3: ("Simulated player (probabilistic strategy)", 6),
+            4: ("Monte Carlo Simulation", 3),
+            5: ("Neural Network", 4),
+            6: ("Heatmap", 5),
+            7: ("Monte Carlo Tree Search (UCT)", 7)}
 
 def clear_console():
   os.system('cls' if os.name == 'nt' else 'clear')
@@ -51,18 +109,642 @@ def clear_console():
 def input_to_coordinate(player_input: str) -> tuple[int, int]:
   # Remove whitespace and make the coordinate upperspace
   player_input = player_input.replace(" ", "").upper()
-  # Check that the length of the string is 2
-  if len(player_input) != 2: return (-1,-1)
-  # Check that the first character is a letter
-  if not player_input[0].isalpha(): return (-1,-1)
-  # Check that the second character is a number
-  if not player_input[1].isdigit(): return (-1,-1)
-  # Checks that the input is not out of bounds for the STR_TO_INT dictionary
-  if player_input[0] > "J": return (-1,-1)
-  col, row = (STR_TO_INT[player_input[0]], int(player_input[1]))
+  # Split into the row letters and the column number
+  num_letters = len(player_input) - len(player_input.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+  row_label, col_number = player_input[:num_letters], player_input[num_letters:]
+  # Check that the letters are a row of the grid (STR_TO_INT) and the rest is a number
+  if row_label not in STR_TO_INT or not col_number.isdecimal(): return (-1,-1)
+  row, col = (STR_TO_INT[row_label], int(col_number))
   # Check that the entry is within the grid
-  if col not in range(10) and row not in range(10): return (-1,-1)
-  return (col, row)
+  if col >= GRID_SIZE: return (-1,-1)
+  return (row, col)
+
+# Pack boolean grids flattened to GRID_SIZE*GRID_SIZE cells into 64-bit words (bit n of the board is cell n)
+#  (..., cells) -> (..., words)
+def pack_cells(cells):
+  cells = np.asarray(cells, dtype=bool)
+  padding = -cells.shape[-1] % 64
+  padded = np.concatenate([cells, np.zeros(cells.shape[:-1] + (padding,), dtype=bool)], axis=-1)
+  return np.packbits(padded, axis=-1, bitorder='little').view('<u8')
+# Inverse of pack_cells, (..., words) -> (..., GRID_SIZE*GRID_SIZE)
+def unpack_cells(words):
+  words = np.ascontiguousarray(words, dtype='<u8')
+  return np.unpackbits(words.view(np.uint8), axis=-1, bitorder='little')[..., :GRID_SIZE * GRID_SIZE].astype(bool)
+
+# transform_data ids of flattened boards from boolean masks (..., GRID_SIZE*GRID_SIZE) of the shot, hit and sunk cells
+#  0: unexplored, 1: hit and destroyed OR miss, 2: hit but not destroyed
+def board_ids(shot, hits, sunk):
+  shot, hits, sunk = np.asarray(shot, dtype=bool), np.asarray(hits, dtype=bool), np.asarray(sunk, dtype=bool)
+  return np.where(hits & ~sunk, 2, shot.astype(np.int8)).astype(np.int8)
+# One-hot layer of each id, ONE_HOT[id] is the (3,) vector of that cell
+ONE_HOT = np.eye(3, dtype=np.float32)
+# NN input of a batch of boards given (B, GRID_SIZE*GRID_SIZE) shot, hit and sunk masks
+#  returns the (B, GRID_SIZE, GRID_SIZE, 3) float32 one-hot 3D representations
+#  layer 0: unexplored
+#  layer 1: hit and destroyed OR miss
+#  layer 2: hit but not destroyed
+def encode_boards(shot, hits, sunk):
+  return ONE_HOT[board_ids(shot, hits, sunk)].reshape(-1, GRID_SIZE, GRID_SIZE, 3)
+
+# Key of a position that is the same for all 8 symmetric versions of it
+#  ids are the flattened board_ids of the board and ship_names the ships still afloat
+#  returns (key, symmetry), key describes the position seen under symmetry (ids[SYMMETRIES[symmetry]]):
+#  one bit per ship of SHIPS_NAMES that is afloat (one byte for up to 7 ships) followed by the ids at 2 bits per cell
+def canonical_position(ids, ship_names) -> tuple[bytes, int]:
+  variants = np.asarray(ids, dtype=np.uint8).reshape(-1)[SYMMETRIES]
+  packed = np.packbits(np.stack([variants >> 1, variants & 1], axis=-1).reshape(len(SYMMETRIES), -1), axis=-1)
+  encodings = [row.tobytes() for row in packed]
+  symmetry = min(range(len(encodings)), key=encodings.__getitem__)
+  ships = sum(1 << SHIPS_NAMES.index(ship_name) for ship_name in ship_names)
+  return ships.to_bytes(len(SHIPS_NAMES) // 8 + 1, 'little') + encodings[symmetry], symmetry
+# Grid of a position seen under symmetry (see canonical_position) turned back to the board's orientation
+def from_canonical(grid, symmetry: int):
+  return np.asarray(grid).reshape(-1)[INVERSE_SYMMETRIES[symmetry]].reshape(GRID_SIZE, GRID_SIZE)
+
+# Label of a row in coordinates like A0: A to Z, then AA, AB, ... on boards of more than 26 rows
+def row_label(row: int) -> str:
+  label = ""
+  row += 1
+  while row > 0:
+    row, letter = divmod(row - 1, 26)
+    label = chr(ord("A") + letter) + label
+  return label
+# Board size and fleet of a game
+#  ships_sizes maps the name of every ship to its size, ships are placed in this order
+class GameConfig:
+  def __init__(self, grid_size: int = GRID_SIZE, ships_sizes: dict = SHIPS_SIZES):
+    self.grid_size = int(grid_size)
+    self.ships_sizes = dict(ships_sizes)
+    if self.grid_size < 2: raise ValueError(f"A board needs at least 2 rows, not {self.grid_size}")
+    if len(self.ships_sizes) == 0: raise ValueError("A fleet needs at least one ship")
+    for ship_name, ship_size in self.ships_sizes.items():
+      # The simulated human's checkerboard search only finds ships of 2 or more cells
+      if ship_size < 2: raise ValueError(f"A {ship_name} of size {ship_size} is too small, ships need at least 2 cells")
+      if ship_size > self.grid_size:
+        raise ValueError(f"A {ship_name} of size {ship_size} does not fit on a {self.grid_size}x{self.grid_size} board")
+  @property
+  def key(self) -> tuple:
+    return (self.grid_size, tuple(self.ships_sizes.items()))
+  # Added to the names of the NN data, models and opening book of this config, "" for the standard game
+  @property
+  def suffix(self) -> str:
+    if self.key == STANDARD_CONFIG.key: return ""
+    return f"-{self.grid_size}x{self.grid_size}-" + ".".join(str(ship_size) for ship_size in self.ships_sizes.values())
+STANDARD_CONFIG = GameConfig()
+# Tables that only depend on the board size, built once per config by use_game_config
+#  STR_TO_INT and INT_TO_STR map row labels (row_label) to row numbers and back
+#  CELL_WORDS holds the packed single-cell boards, CELL_WORDS[n] has only cell n set
+#  SYMMETRIES holds the 8 symmetries of the square board (4 rotations, with and without a reflection) as cell permutations,
+#  a flattened grid seen under symmetry s is grid[SYMMETRIES[s]], and grid[INVERSE_SYMMETRIES[s]] turns it back
+CONFIG_TABLES = {}
+def build_config_tables() -> tuple:
+  int_to_str = {row: row_label(row) for row in range(GRID_SIZE)}
+  str_to_int = {label: row for row, label in int_to_str.items()}
+  cell_words = pack_cells(np.eye(GRID_SIZE * GRID_SIZE, dtype=bool))
+  cell_grid = np.arange(GRID_SIZE * GRID_SIZE).reshape(GRID_SIZE, GRID_SIZE)
+  symmetries = np.stack([np.rot90(grid, k).reshape(-1) for grid in (cell_grid, cell_grid.T) for k in range(4)])
+  return str_to_int, int_to_str, cell_words, symmetries, np.argsort(symmetries, axis=1)
+# Make config the game of the whole program: every board, strategy and table after this uses its size and fleet
+#  Placement tables are cached per board size (get_placement_table), the other tables per config in CONFIG_TABLES.
+#  Worker processes are switched with the config they are given (see run_benchmark).
+def use_game_config(config: GameConfig) -> None:
+  global GAME_CONFIG, GRID_SIZE, SHIPS_SIZES, SHIPS_NAMES, STR_TO_INT, INT_TO_STR, CELL_WORDS, SYMMETRIES, INVERSE_SYMMETRIES
+  global OPENING_BOOK
+  GAME_CONFIG = config
+  GRID_SIZE = config.grid_size
+  SHIPS_SIZES = dict(config.ships_sizes)
+  SHIPS_NAMES = list(config.ships_sizes)
+  if config.key not in CONFIG_TABLES: CONFIG_TABLES[config.key] = build_config_tables()
+  STR_TO_INT, INT_TO_STR, CELL_WORDS, SYMMETRIES, INVERSE_SYMMETRIES = CONFIG_TABLES[config.key]
+  # The opening book and cached heatmaps are positions of the previous config
+  OPENING_BOOK = None
+  if "HEATMAP_CACHE" in globals(): HEATMAP_CACHE.clear()
+use_game_config(STANDARD_CONFIG)
+
+# gen_AI_move style_choice: name of the strategy in profiles
+STYLE_NAMES = {1: "random", 2: "human even", 3: "mcts", 4: "nn", 5: "heatmap", 6: "human probable", 7: "uct"}
+
+# One timed block of Profiler.phase, entering it with a strategy makes that the strategy of the phases inside it
+class ProfilePhase:
+  __slots__ = ("profiler", "name", "strategy", "outer_strategy", "start")
+  def __init__(self, profiler, name: str, strategy):
+    self.profiler = profiler
+    self.name = name
+    self.strategy = strategy
+  def __enter__(self):
+    profiler = self.profiler
+    self.outer_strategy = profiler.strategy
+    if self.strategy is not None: profiler.strategy = self.strategy
+    self.start = time.perf_counter_ns()
+    return self
+  def __exit__(self, *exc_info):
+    end = time.perf_counter_ns()
+    profiler = self.profiler
+    profiler.add_time(profiler.strategy, self.name, self.start, end - self.start)
+    profiler.strategy = self.outer_strategy
+    return False
+# Timers and counters of the phases of each strategy's moves (encode, sample, score, select, apply, ...)
+#  with PROFILER.phase("sample"): times a block under the current strategy, set by an outer phase("move", "heatmap")
+#  PROFILER.count("rollouts", n) adds to a counter of the current strategy
+#  While the profiler is off both cost one attribute check. Timers keep [calls, total ns, max ns] per
+#  (strategy, phase) and include the phases nested in them. While tracing, every timed block is also kept
+#  (up to max_events) for the Chrome trace.
+class Profiler:
+  NULL_PHASE = contextlib.nullcontext()
+  def __init__(self, max_events: int = PROFILE_MAX_EVENTS):
+    self.enabled = False
+    self.tracing = False
+    self.max_events = max_events
+    self.strategy = "game"
+    self.reset()
+  def reset(self) -> None:
+    self.timers = {}
+    self.counters = {}
+    self.events = []
+    self.dropped_events = 0
+  def enable(self, tracing: bool = False) -> None:
+    self.enabled = True
+    self.tracing = tracing
+  def disable(self) -> None:
+    self.enabled = self.tracing = False
+  def phase(self, name: str, strategy=None):
+    if not self.enabled: return Profiler.NULL_PHASE
+    return ProfilePhase(self, name, strategy)
+  def count(self, name: str, n: int = 1) -> None:
+    if not self.enabled: return
+    key = (self.strategy, name)
+    self.counters[key] = self.counters.get(key, 0) + n
+  def add_time(self, strategy: str, name: str, start: int, duration: int) -> None:
+    timer = self.timers.get((strategy, name))
+    if timer is None: self.timers[(strategy, name)] = [1, duration, duration]
+    else:
+      timer[0] += 1
+      timer[1] += duration
+      if duration > timer[2]: timer[2] = duration
+    if self.tracing:
+      if len(self.events) < self.max_events: self.events.append((strategy, name, start, duration))
+      else: self.dropped_events += 1
+  # Everything recorded so far as plain data (for sending back from worker processes), then start over
+  def take(self) -> dict:
+    data = {"pid": os.getpid(), "timers": self.timers, "counters": self.counters, "events": self.events, "dropped_events": self.dropped_events}
+    self.reset()
+    return data
+  # Add the data of take() from another profiler (or process), its trace events keep their pid
+  def merge(self, data: dict) -> None:
+    for key, (calls, total, longest) in data["timers"].items():
+      timer = self.timers.setdefault(key, [0, 0, 0])
+      timer[0] += calls
+      timer[1] += total
+      timer[2] = max(timer[2], longest)
+    for key, n in data["counters"].items(): self.counters[key] = self.counters.get(key, 0) + n
+    self.events += [(data["pid"],) + event for event in data["events"]]
+    self.dropped_events += data["dropped_events"]
+  # {strategy: {"phases": {phase: {calls, total_s, mean_us, max_us}}, "counters": {name: n}}}
+  def stats(self) -> dict:
+    stats = {}
+    for (strategy, name), (calls, total, longest) in sorted(self.timers.items()):
+      stats.setdefault(strategy, {"phases": {}, "counters": {}})["phases"][name] = {
+        "calls": calls, "total_s": total / 1e9, "mean_us": total / calls / 1e3, "max_us": longest / 1e3}
+    for (strategy, name), n in sorted(self.counters.items()):
+      stats.setdefault(strategy, {"phases": {}, "counters": {}})["counters"][name] = n
+    return stats
+  # Chrome trace event format (chrome://tracing or ui.perfetto.dev), one complete event per timed block
+  #  events merged from another process keep that process's pid, the others get this one's
+  def chrome_trace(self) -> dict:
+    trace_events = []
+    for event in self.events:
+      pid, (strategy, name, start, duration) = (event[0], event[1:]) if len(event) == 5 else (os.getpid(), event)
+      trace_events.append({"name": name, "cat": strategy, "ph": "X", "ts": start / 1e3, "dur": duration / 1e3, "pid": pid, "tid": pid})
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms",
+            "otherData": {"phases": self.stats(), "dropped_events": self.dropped_events}}
+  # Save the stats as JSON (profile_format "json") or the Chrome trace (profile_format "chrome")
+  def save(self, path: str, profile_format: str = "json") -> None:
+    data = self.chrome_trace() if profile_format == "chrome" else self.stats()
+    with open(path, 'w') as file:
+      json.dump(data, file, indent=1)
+PROFILER = Profiler()
+
+# Least recently used heatmaps by position, the symmetric versions of a position share one heatmap
+#  Heatmaps are stored in the orientation of their canonical_position key and turned back on the way out.
+#  Once the keys and heatmaps take more than max_bytes the least recently used ones are evicted.
+class HeatmapCache:
+  def __init__(self, max_bytes: int):
+    self.max_bytes = max_bytes
+    self.entries = OrderedDict()
+    self.size = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+  # Heatmap of nreps sims of a position (flattened board_ids and the ships afloat), compute() makes it if it is not stored
+  #  returns a new array in the position's orientation
+  def get(self, ids, ship_names, nreps: int, compute):
+    key, symmetry = canonical_position(ids, ship_names)
+    key = (key, nreps)
+    if key in self.entries:
+      self.hits += 1
+      PROFILER.count("heatmap cache hit")
+      self.entries.move_to_end(key)
+      return from_canonical(self.entries[key], symmetry)
+    self.misses += 1
+    PROFILER.count("heatmap cache miss")
+    heatmap = compute()
+    self.put(key, np.asarray(heatmap).reshape(-1)[SYMMETRIES[symmetry]])
+    return heatmap
+  def put(self, key, heatmap) -> None:
+    size = len(key[0]) + heatmap.nbytes
+    if size > self.max_bytes: return
+    self.entries[key] = heatmap
+    self.size += size
+    while self.size > self.max_bytes:
+      old_key, old_heatmap = self.entries.popitem(last=False)
+      self.size -= len(old_key[0]) + old_heatmap.nbytes
+      self.evictions += 1
+  def clear(self) -> None:
+    self.entries.clear()
+    self.size = 0
+  def stats(self) -> dict:
+    return {"entries": len(self.entries), "bytes": self.size, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+HEATMAP_CACHE = HeatmapCache(HEATMAP_CACHE_BYTES)
+
+# Every placement of a single ship size on the grid, built once per size by get_placement_table
+#  masks holds one flattened boolean grid per placement (placements x GRID_SIZE*GRID_SIZE), words is the packed version
+#  cells holds each placement's cell numbers (cell_array as a placements x ship_size array) and bits the placement
+#  as a python int bitboard (bit n set if the ship covers cell n)
+#  index maps (horizontal, top row, left col) to the placement's position in those lists
+#  anchor_table maps [anchor cell][swing direction] to a placement index, or -1 if the swing leaves the grid
+#  swing directions follow get_allowed_swing_points: down, right, up, left
+#  through[n] holds the indices of the placements that cover cell n, through_array is through as a (cells x most placements)
+#  array padded with len(bits), one past the last placement. cover is masks as float32 for matrix products
+class PlacementTable:
+  def __init__(self, ship_size: int):
+    self.ship_size = ship_size
+    placement_index = {}
+    masks = []
+    # Horizontal placements (anchored on their leftmost cell) then vertical placements (anchored on their top cell)
+    for horizontal in (True, False):
+      for row in range(GRID_SIZE if horizontal else GRID_SIZE - ship_size + 1):
+        for col in range(GRID_SIZE - ship_size + 1 if horizontal else GRID_SIZE):
+          mask = np.zeros(GRID_SIZE * GRID_SIZE, dtype=bool)
+          for n in range(ship_size):
+            if horizontal: mask[row * GRID_SIZE + col + n] = True
+            else: mask[(row + n) * GRID_SIZE + col] = True
+          placement_index[(horizontal, row, col)] = len(masks)
+          masks.append(mask)
+    self.index = placement_index
+    self.masks = np.array(masks)
+    self.words = pack_cells(self.masks)
+    self.cells = [np.flatnonzero(mask).tolist() for mask in self.masks]
+    self.cell_array = np.array(self.cells, dtype=np.int64).reshape(len(masks), ship_size)
+    self.bits = [sum(1 << n for n in cells) for cells in self.cells]
+    self.anchor_table = np.full((GRID_SIZE * GRID_SIZE, 4), -1, dtype=np.int64)
+    for row in range(GRID_SIZE):
+      for col in range(GRID_SIZE):
+        swings = [(False, row, col), (True, row, col), (False, row - (ship_size - 1), col), (True, row, col - (ship_size - 1))]
+        for direction, key in enumerate(swings):
+          self.anchor_table[row * GRID_SIZE + col][direction] = placement_index.get(key, -1)
+    self.through = [np.flatnonzero(self.masks[:, n]) for n in range(GRID_SIZE * GRID_SIZE)]
+    self.through_array = np.full((GRID_SIZE * GRID_SIZE, max(len(through) for through in self.through)), len(self.bits))
+    for n, through in enumerate(self.through): self.through_array[n, :len(through)] = through
+    self.cover = self.masks.astype(np.float32)
+
+# Keyed by (GRID_SIZE, ship_size), tables of other board sizes stay cached when the game config changes
+PLACEMENT_TABLES = {}
+def get_placement_table(ship_size: int) -> PlacementTable:
+  key = (GRID_SIZE, ship_size)
+  if key not in PLACEMENT_TABLES:
+    PLACEMENT_TABLES[key] = PlacementTable(ship_size)
+  return PLACEMENT_TABLES[key]
+
+# n random fleet layouts at once, every layout of the SHIPS_NAMES ships without overlaps being equally likely
+#  Every ship gets a random placement of its placement table and layouts with overlapping ships are drawn again
+#  (about 40% of the draws have none). Draws from numpy's global random state, or its own one if seed is given.
+#  returns an (n, len(SHIPS_NAMES)) int32 array, the placement of each ship in its get_placement_table (see place_fleet)
+def random_fleet_layouts(n: int, seed=None):
+  rng = np.random if seed is None else np.random.RandomState(seed)
+  tables = [get_placement_table(SHIPS_SIZES[ship_name]) for ship_name in SHIPS_NAMES]
+  layouts = [np.zeros((0, len(tables)), dtype=np.int32)]
+  found = 0
+  while found < n:
+    draws = max(64, 3 * (n - found))
+    placements = np.stack([rng.randint(0, len(table.bits), draws) for table in tables], axis=1).astype(np.int32)
+    used = np.zeros((draws, CELL_WORDS.shape[1]), dtype=CELL_WORDS.dtype)
+    valid = np.ones(draws, dtype=bool)
+    for ship, table in enumerate(tables):
+      words = table.words[placements[:, ship]]
+      valid &= ~(used & words).any(axis=1)
+      used |= words
+    layouts.append(placements[valid])
+    found += int(valid.sum())
+  return np.concatenate(layouts)[:n]
+
+# Placements of every ship size that avoid all shot cells, kept up to date one shot at a time
+#  feasible[ship_size] flags each placement of get_placement_table(ship_size) that avoids every shot cell
+#  counts[ship_size] is the number of those placements covering each cell (GRID_SIZE*GRID_SIZE)
+class PlacementCounts:
+  def __init__(self, shot: int = 0):
+    self.tables = {ship_size: get_placement_table(ship_size) for ship_size in set(SHIPS_SIZES.values())}
+    self.feasible = {}
+    self.counts = {}
+    shot_words = pack_cells(Bitboard.array(shot))
+    for ship_size, table in self.tables.items():
+      self.feasible[ship_size] = ~(table.words & shot_words).any(axis=1)
+      self.counts[ship_size] = self.feasible[ship_size].astype(float) @ table.cover
+  # The tables are left out when pickled (sending a board to a worker), the receiving process takes its own
+  def __getstate__(self):
+    return {"feasible": self.feasible, "counts": self.counts}
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self.tables = {ship_size: get_placement_table(ship_size) for ship_size in self.feasible}
+  # Remove the placements through a newly shot cell, only the few placements covering it are touched
+  def shoot(self, row: int, col: int) -> None:
+    for ship_size, table in self.tables.items():
+      through = table.through[int(row * GRID_SIZE + col)]
+      removed = through[self.feasible[ship_size][through]]
+      if removed.size == 0: continue
+      self.feasible[ship_size][removed] = False
+      self.counts[ship_size] -= table.masks[removed].sum(axis=0)
+  # Sum of the counts of every ship in ship_names (GRID_SIZE*GRID_SIZE), sunk ships are left out by leaving out their names
+  def total(self, ship_names):
+    probability_array = np.zeros(GRID_SIZE * GRID_SIZE)
+    for ship_name in ship_names: probability_array += self.counts[SHIPS_SIZES[ship_name]]
+    return probability_array
+
+# Batched version of the get_heatmap simulation: places the ships for nreps boards at once
+#  current_state is a transform_data grid (0: unexplored, 1: hit and destroyed OR miss, 2: hit but not destroyed)
+#  Each ship is placed like randomly_place_ship: random anchors on free cells until one has an allowed swing,
+#  then a random allowed swing, giving up on a board after 500 attempts. Every attempt is run for all boards at once.
+#  returns (occupied, num_overlaps): the simulated ship cells of every board (nreps x GRID_SIZE*GRID_SIZE)
+#  and how many not-yet-destroyed hits each board's ships cover
+def simulate_ship_placements(current_state, ship_names, nreps: int):
+  flat_state = np.array(current_state).reshape(-1)
+  pending_hits = flat_state == 2
+  blocked = np.tile(pack_cells(flat_state == 1), (nreps, 1))
+  occupied = np.zeros_like(blocked)
+  num_overlaps = np.zeros(nreps, dtype=np.int64)
+  # Boards that fail to place a ship keep the ships placed so far, as in the original 500 attempt cutoff
+  placing = np.ones(nreps, dtype=bool)
+  for ship in ship_names:
+    table = get_placement_table(SHIPS_SIZES[ship])
+    # Overlaps with undestroyed hits of every placement, and the padding slot used for swings leaving the grid
+    placement_overlaps = table.masks[:, pending_hits].sum(axis=1)
+    placement_words = np.concatenate([table.words, np.zeros((1, table.words.shape[1]), dtype=table.words.dtype)])
+    waiting = np.flatnonzero(placing)
+    attempts = np.zeros(nreps, dtype=np.int64)
+    while len(waiting) > 0:
+      waiting_blocked = blocked[waiting]
+      rows = np.arange(len(waiting))
+      # Random anchor not already used: draw a few candidate cells per board and keep the first free one
+      #  (boards where every candidate was used simply draw again, which is not counted as an attempt)
+      candidates = (np.random.random((len(waiting), ANCHOR_CANDIDATES)) * (GRID_SIZE * GRID_SIZE)).astype(np.int64)
+      candidate_bits = waiting_blocked[rows[:, None], candidates >> 6] >> (candidates & 63).astype(np.uint64)
+      candidate_free = (candidate_bits & np.uint64(1)) == 0
+      has_anchor = candidate_free.any(axis=1)
+      anchor = candidates[rows, np.argmax(candidate_free, axis=1)]
+      # Allowed swings from the anchor: in the grid and no used cells between the anchor and swing point
+      swings = table.anchor_table[anchor]
+      conflicts = np.zeros(swings.shape, dtype=np.uint64)
+      for word in range(blocked.shape[1]):
+        conflicts |= waiting_blocked[:, word, None] & placement_words[swings, word]
+      swing_allowed = (swings >= 0) & (conflicts == 0) & has_anchor[:, None]
+      num_swings = swing_allowed.sum(axis=1)
+      # Random allowed swing for the boards that found one
+      placed = num_swings > 0
+      pick = (np.random.random(len(waiting)) * num_swings).astype(np.int64)
+      direction = np.argmax(np.cumsum(swing_allowed, axis=1, dtype=np.int8) > pick[:, None], axis=1)
+      boards = waiting[placed]
+      placement = swings[placed, direction[placed]]
+      blocked[boards] |= table.words[placement]
+      occupied[boards] |= table.words[placement]
+      num_overlaps[boards] += placement_overlaps[placement]
+      # Anchors without an allowed swing count as a failed attempt
+      attempts[waiting] += has_anchor
+      waiting = waiting[~placed]
+      placing[waiting[attempts[waiting] >= 500]] = False
+      waiting = waiting[attempts[waiting] < 500]
+  return unpack_cells(occupied), num_overlaps
+
+# Raised by count_ship_layouts when the board is too open to enumerate within EXACT_MAX_STATES
+#  the check is an upper bound taken before enumerating, so giving up costs about a millisecond
+class LayoutLimitReached(Exception):
+  pass
+
+# Exact version of the get_heatmap distribution: counts every layout of the remaining ships that fits the board
+#  current_state is a transform_data grid (0: unexplored, 1: hit and destroyed OR miss, 2: hit but not destroyed)
+#  A layout fits if no two ships overlap, no ship covers a 1, and every 2 is covered by some ship
+#  returns (heatmap, num_layouts) where heatmap[row][col] is the number of layouts with a ship on that unexplored cell
+#  raises LayoutLimitReached, before enumerating anything, if more than max_states partial layouts could have to be memoized
+def count_ship_layouts(current_state, ship_names, max_states: int = EXACT_MAX_STATES):
+  flat_state = np.array(current_state).reshape(-1)
+  blocked = sum(1 << int(n) for n in np.flatnonzero(flat_state == 1))
+  pending_hits = sum(1 << int(n) for n in np.flatnonzero(flat_state == 2))
+  tables = [get_placement_table(SHIPS_SIZES[ship]) for ship in ship_names]
+  # Placements of each ship that avoid every miss and destroyed ship, as (placement index, bitboard)
+  candidates = [[(i, bits) for i, bits in enumerate(table.bits) if bits & blocked == 0] for table in tables]
+  # Ships with the fewest placements go first, which keeps the number of partial layouts down (the counts do not depend on the order)
+  order = sorted(range(len(tables)), key=lambda ship: len(candidates[ship]))
+  tables, candidates = [tables[ship] for ship in order], [candidates[ship] for ship in order]
+  # The first i ships can be placed in at most the product of their numbers of placements, which bounds the memo
+  #  without enumerating anything. Open boards are given up on here instead of after filling the memo.
+  max_partial_layouts = sum(math.prod(len(placements) for placements in candidates[:i]) for i in range(len(tables) + 1))
+  if max_partial_layouts > max_states: raise LayoutLimitReached()
+  # Number of cells the ships from index i onwards can still cover
+  cells_left = [sum(table.ship_size for table in tables[i:]) for i in range(len(tables) + 1)]
+
+  # completions[(i, used)] is the number of ways to place ships i.. around the cells already used
+  completions = {}
+  def count_completions(i: int, used: int) -> int:
+    if (i, used) in completions: return completions[(i, used)]
+    uncovered_hits = pending_hits & ~used
+    if i == len(tables): count = 1 if uncovered_hits == 0 else 0
+    # Not enough ship cells left to cover the remaining hits
+    elif bin(uncovered_hits).count("1") > cells_left[i]: count = 0
+    else:
+      count = sum(count_completions(i + 1, used | bits) for _, bits in candidates[i] if bits & used == 0)
+    completions[(i, used)] = count
+    return count
+
+  num_layouts = count_completions(0, 0)
+  # Walk forward through the partial layouts, crediting each placement with the layouts that use it
+  placement_counts = [np.zeros(len(table.bits)) for table in tables]
+  reached = {0: 1}
+  for i in range(len(tables)):
+    next_reached = {}
+    for used, ways in reached.items():
+      for index, bits in candidates[i]:
+        if bits & used: continue
+        count = completions.get((i + 1, used | bits), 0)
+        if count == 0: continue
+        placement_counts[i][index] += ways * count
+        next_reached[used | bits] = next_reached.get(used | bits, 0) + ways
+    reached = next_reached
+  heatmap = sum(counts @ table.masks for counts, table in zip(placement_counts, tables))
+  heatmap = np.asarray(heatmap, dtype=float) * (flat_state == 0)
+  return heatmap.reshape(GRID_SIZE, GRID_SIZE), num_layouts
+
+# Compact board core, each field is a python int with bit row*GRID_SIZE+col set for that cell
+#  ships: cells holding a ship, hits: ship cells that have been struck, misses: struck cells without a ship
+#  sunk: cells of ships that have been sunk
+# BoardState keeps its state / fog_of_war character grids as views built from these masks
+class Bitboard:
+  def __init__(self, ships: int = 0, hits: int = 0, misses: int = 0, sunk: int = 0):
+    self.ships = ships
+    self.hits = hits
+    self.misses = misses
+    self.sunk = sunk
+
+  # Boolean array (GRID_SIZE*GRID_SIZE) of the cells set in a mask
+  @staticmethod
+  def array(mask: int):
+    cell_bytes = np.frombuffer(mask.to_bytes((GRID_SIZE * GRID_SIZE + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(cell_bytes, bitorder='little')[:GRID_SIZE * GRID_SIZE].astype(bool)
+  @staticmethod
+  def cell(row: int, col: int) -> int:
+    return 1 << int(row * GRID_SIZE + col)
+  # Mask of a list of [row, col] grid locations
+  @staticmethod
+  def cells(locations) -> int:
+    mask = 0
+    for row, col in locations: mask |= 1 << (row * GRID_SIZE + col)
+    return mask
+  # (shot, hits, sunk) boolean arrays, the input of board_ids and encode_boards
+  def masks(self):
+    return Bitboard.array(self.shot()), Bitboard.array(self.hits), Bitboard.array(self.sunk)
+  # Cells that have been struck (hit or miss)
+  def shot(self) -> int:
+    return self.hits | self.misses
+  def is_shot(self, row: int, col: int) -> bool:
+    return (self.hits | self.misses) >> int(row * GRID_SIZE + col) & 1 == 1
+  def is_hit(self, row: int, col: int) -> bool:
+    return self.hits >> int(row * GRID_SIZE + col) & 1 == 1
+  def is_miss(self, row: int, col: int) -> bool:
+    return self.misses >> int(row * GRID_SIZE + col) & 1 == 1
+  def is_ship(self, row: int, col: int) -> bool:
+    return self.ships >> int(row * GRID_SIZE + col) & 1 == 1
+  # True if a ship could be placed on every cell of mask (nothing placed or struck there)
+  def fits(self, mask: int) -> bool:
+    return mask & (self.ships | self.hits | self.misses) == 0
+  # True if every cell of the ship mask has been hit
+  def is_sunk(self, mask: int) -> bool:
+    return self.hits & mask == mask
+  # Strike a cell, returns True for ship hit or False for ship not hit
+  def fire(self, row: int, col: int) -> bool:
+    bit = 1 << int(row * GRID_SIZE + col)
+    if self.ships & bit:
+      self.hits |= bit
+      return True
+    self.misses |= bit
+    return False
+
+  """GRID VIEWS"""
+  # '~' empty, '#' ship, 'X' hit, 'O' miss
+  def state_grid(self) -> list[list[str]]:
+    grid = [['~'] * GRID_SIZE for _ in range(GRID_SIZE)]
+    for row in range(GRID_SIZE):
+      for col in range(GRID_SIZE):
+        bit = 1 << (row * GRID_SIZE + col)
+        if self.hits & bit: grid[row][col] = 'X'
+        elif self.misses & bit: grid[row][col] = 'O'
+        elif self.ships & bit: grid[row][col] = PIECE_CHAR
+    return grid
+  # '~' unexplored, 'X' hit, 'O' miss
+  def fog_grid(self) -> list[list[str]]:
+    grid = [['~'] * GRID_SIZE for _ in range(GRID_SIZE)]
+    for row in range(GRID_SIZE):
+      for col in range(GRID_SIZE):
+        bit = 1 << (row * GRID_SIZE + col)
+        if self.hits & bit: grid[row][col] = 'X'
+        elif self.misses & bit: grid[row][col] = 'O'
+    return grid
+  # Replace the ships, hits and misses with the ones drawn on a state grid
+  def load_state(self, grid) -> None:
+    self.ships = self.hits = self.misses = 0
+    for row in range(GRID_SIZE):
+      for col in range(GRID_SIZE):
+        bit = 1 << (row * GRID_SIZE + col)
+        if grid[row][col] in (PIECE_CHAR, 'X'): self.ships |= bit
+        if grid[row][col] == 'X': self.hits |= bit
+        if grid[row][col] == 'O': self.misses |= bit
+  # Replace the hits and misses with the ones drawn on a fog of war grid
+  def load_fog(self, grid) -> None:
+    self.hits = self.misses = 0
+    for row in range(GRID_SIZE):
+      for col in range(GRID_SIZE):
+        bit = 1 << (row * GRID_SIZE + col)
+        if grid[row][col] == 'X': self.hits |= bit
+        if grid[row][col] == 'O': self.misses |= bit
+
+# Score of every cell (GRID_SIZE*GRID_SIZE) for the next shot on a board, used as the fast policy of the UCT player
+#  counts the placements of each ship in ship_names that avoid misses and sunk ships, placements through unsunk hits
+#  count 1 + TARGET_WEIGHT per hit they cover, so cells next to hits come first. Shot cells score 0.
+#  Works on each placement's ship_size cells (cell_array) rather than whole-grid masks, so the cost grows with the
+#  number of placements and not with placements x cells.
+def shot_scores(board: Bitboard, ship_names):
+  blocked = Bitboard.array(board.misses | board.sunk)
+  pending = Bitboard.array(board.hits & ~board.sunk)
+  scores = np.zeros(GRID_SIZE * GRID_SIZE)
+  # Ships of the same size share their placements, so each size is counted once and weighted by its number of ships
+  ship_counts = {}
+  for ship_name in ship_names: ship_counts[SHIPS_SIZES[ship_name]] = ship_counts.get(SHIPS_SIZES[ship_name], 0) + 1
+  for ship_size, num_ships in ship_counts.items():
+    table = get_placement_table(ship_size)
+    weights = ~blocked[table.cell_array].any(axis=1) * (num_ships + num_ships * TARGET_WEIGHT * pending[table.cell_array].sum(axis=1))
+    scores += np.bincount(table.cell_array.ravel(), weights=np.repeat(weights, ship_size), minlength=GRID_SIZE * GRID_SIZE)
+  scores[Bitboard.array(board.shot())] = 0
+  return scores
+# Random full layout of the ships in ship_names that agrees with everything seen on board
+#  ships avoid misses, sunk ships and each other and together cover every unsunk hit. Unsunk hits are covered first
+#  (by a random ship placement through the hit), so layouts are close to but not exactly uniform.
+#  returns {ship name: bitboard mask}, or None if no layout was found in max_attempts attempts
+def sample_fleet_layout(board: Bitboard, ship_names, max_attempts: int = 100):
+  for _ in range(max_attempts):
+    used = board.misses | board.sunk
+    uncovered = board.hits & ~board.sunk
+    remaining = list(ship_names)
+    layout = {}
+    while remaining:
+      if uncovered:
+        # Lowest unsunk hit that no ship covers yet
+        cell = (uncovered & -uncovered).bit_length() - 1
+        options = []
+        for ship_name in remaining:
+          table = get_placement_table(SHIPS_SIZES[ship_name])
+          options += [(ship_name, table.bits[i]) for i in table.through[cell] if table.bits[i] & used == 0]
+      else:
+        ship_name = remaining[0]
+        options = [(ship_name, bits) for bits in get_placement_table(SHIPS_SIZES[ship_name]).bits if bits & used == 0]
+      if not options: break
+      ship_name, bits = random.choice(options)
+      layout[ship_name] = bits
+      used |= bits
+      uncovered &= ~bits
+      remaining.remove(ship_name)
+    if not remaining and not uncovered: return layout
+  return None
+
+# Node of the UCT search tree for one board (shot cells, hits, sunk cells and ships remaining)
+#  candidates are the cells the node chooses between, visits and value hold each candidate's rollouts and total reward
+class UCTNode:
+  def __init__(self, board: Bitboard, ship_names):
+    scores = shot_scores(board, ship_names)
+    order = np.argsort(-scores, kind='stable')[:UCT_CANDIDATES]
+    self.candidates = order[scores[order] > 0]
+    self.visits = np.zeros(len(self.candidates))
+    self.value = np.zeros(len(self.candidates))
+    self.total_visits = 0
+
+  # Candidate to play next: every candidate once (best score first), then the one with the highest UCB
+  def select(self) -> int:
+    if self.total_visits < len(self.candidates): return int(np.argmin(self.visits > 0))
+    ucb = self.value / self.visits + UCT_EXPLORATION * np.sqrt(np.log(self.total_visits) / self.visits)
+    return int(np.argmax(ucb))
+  def update(self, choice: int, reward: float) -> None:
+    self.visits[choice] += 1
+    self.value[choice] += reward
+    self.total_visits += 1
+
+# Transposition table key of a board
+def board_key(board: Bitboard, ship_names) -> tuple:
+  return (board.hits, board.misses, board.sunk, tuple(sorted(ship_names)))
 
 # MCTS Implementation
 class mcts:
@@ -71,71 +753,66 @@ class mcts:
     self.move_sim = samples
     self.priority = 5
     self.max_attempts = 100  # Maximum number of attempts to place a ship
+    # UCT nodes by board_key, kept between moves so the tree under the chosen shot is reused
+    self.table = {}
 
-  def monte_carlo(self, fog_of_war):
-    simulations = []
-    for _ in range(self.move_sim):
-      simulated_board, intersect = self.simulate_ship(fog_of_war)
-      if intersect:
-        for _ in range(self.priority):
-          simulations.append(simulated_board)
-      simulations.append(simulated_board)
-    simulations = np.array(simulations)
-    percentages = np.mean(simulations, axis=0)
+  # Probability of a ship on each grid location, the weighted mean of the simulated boards
+  def monte_carlo(self):
+    with PROFILER.phase("sample"): simulations, weights = self.simulate_ships()
+    with PROFILER.phase("score"): percentages = np.tensordot(weights, simulations, axes=1) / weights.sum()
     return percentages
 
-  def simulate_ship(self, fog_of_war):
-    simulated_board = np.zeros((GRID_SIZE, GRID_SIZE))
-    intersect = 0
+  # Simulates move_sim boards at once from the placement tables
+  #  Each ship is placed the way it always was: every attempt flips between a random horizontal placement and
+  #  (if that one hits a checked cell) a random vertical one, and a ship is left out after max_attempts failed attempts.
+  #  All attempts of all boards are drawn up front and the first one that fits is kept.
+  #  returns (simulations, weights): the (move_sim, GRID_SIZE, GRID_SIZE) uint8 simulated boards and a weight per board,
+  #  1 + priority for boards whose ships cover a hit and 1 for the rest
+  def simulate_ships(self):
+    simulations = np.zeros((self.move_sim, GRID_SIZE * GRID_SIZE), dtype=np.uint8)
+    intersect = np.zeros(self.move_sim, dtype=np.int64)
+    hits = Bitboard.array(self.env.board.hits)
+    boards = np.arange(self.move_sim)
     for ship_name, ship_size in SHIPS_SIZES.items():
-      placed = False
-      attempts = 0
-      while not placed and attempts < self.max_attempts:
-        attempts += 1
-        orientation = random.choice(['H', 'V'])
-        if orientation == 'H':
-          row = random.randint(0, GRID_SIZE - 1)
-          col = random.randint(0, GRID_SIZE - ship_size)
-          if all(fog_of_war[row][c] == '~' for c in range(col, col + ship_size)):
-            for c in range(col, col + ship_size):
-              simulated_board[row][c] = 1
-              if fog_of_war[row][c] == 'X':
-                intersect += 1
-            placed = True
-          else:
-            row = random.randint(0, GRID_SIZE - ship_size)
-            col = random.randint(0, GRID_SIZE - 1)
-            if all(fog_of_war[r][col] == '~' for r in range(row, row + ship_size)):
-              for r in range(row, row + ship_size):
-                simulated_board[r][col] = 1
-                if fog_of_war[r][col] == 'X':
-                  intersect += 1
-              placed = True
-    return simulated_board, intersect
+      table = get_placement_table(ship_size)
+      # Placements that avoid every checked cell
+      feasible = self.env.placements.feasible[ship_size]
+      num_horizontal = GRID_SIZE * (GRID_SIZE - ship_size + 1)
+      horizontal = np.random.rand(self.move_sim, self.max_attempts) < 0.5
+      h_choice = np.random.randint(0, num_horizontal, (self.move_sim, self.max_attempts))
+      v_choice = np.random.randint(num_horizontal, len(table.bits), (self.move_sim, self.max_attempts))
+      # The vertical placement is only tried when the horizontal one does not fit
+      choice = np.where(feasible[h_choice], h_choice, v_choice)
+      placed = horizontal & feasible[choice]
+      first = np.argmax(placed, axis=1)
+      chosen = choice[boards, first]
+      masks = table.masks[chosen] & placed[boards, first][:, None]
+      simulations |= masks
+      intersect += (masks & hits).sum(axis=1)
+    weights = np.where(intersect > 0, 1 + self.priority, 1).astype(float)
+    return simulations.reshape(self.move_sim, GRID_SIZE, GRID_SIZE), weights
 
   def ai_mcts_move(self):
-    fog_of_war = self.env.fog_of_war
-    #print("Fog of War:", fog_of_war)
-    percentages = self.monte_carlo(fog_of_war)
+    row, col = self.choose_move()
+    with PROFILER.phase("apply"): return self.apply_move(row, col)
+  def choose_move(self) -> tuple[int, int]:
+    # Cells pushed next to a hit can be struck before they are popped (by another hit's targeting or a probable move)
+    while self.env.hit_stack and self.env.board.is_shot(*self.env.hit_stack[-1]): self.env.hit_stack.pop()
+    percentages = self.monte_carlo()
     #print("Probabilities:", percentages)
-    max_prob = -1
-    move = (0, 0)
 
-    if self.env.target_mode and self.env.hit_stack:
-      move = self.env.hit_stack.pop()
-      #print("Target mode. Move from hit stack:", move)
-    else:
-      for row in range(GRID_SIZE):
-        for col in range(GRID_SIZE):
-          if self.env.state[row][col] not in ('X', 'O') and percentages[row][col] > max_prob:
-            max_prob = percentages[row][col]
-            move = (row, col)
-      #print("Selected move based on probabilities:", move)
-
-    row, col = move
-    if self.env.state[row][col] == '#':
-      self.env.fog_of_war[row][col] = 'X'
-      self.env.state[row][col] = 'X'
+    with PROFILER.phase("select"):
+      if self.env.target_mode and self.env.hit_stack:
+        move = self.env.hit_stack.pop()
+        #print("Target mode. Move from hit stack:", move)
+      else:
+        # Most probable unshot cell, the first one in row order on ties
+        shot = Bitboard.array(self.env.board.shot()).reshape(GRID_SIZE, GRID_SIZE)
+        move = divmod(int(np.argmax(np.where(shot, -1, percentages))), GRID_SIZE)
+        #print("Selected move based on probabilities:", move)
+    return move
+  def apply_move(self, row: int, col: int) -> bool:
+    if self.env.fire(row, col):
       self.env.target_mode = True
       self.env.update_probabilities_after_hit(row, col)
       self.update_hit_stack(row, col)
@@ -147,17 +824,107 @@ class mcts:
         #print(f"The enemy has sunk your {sunk_ship}!")
       return True
     else:
-      self.env.fog_of_war[row][col] = 'O'
-      self.env.state[row][col] = 'O'
       #print("Miss at:", move)
       self.handle_miss(row, col)
       return False
 
+  # Chooses a move with Monte Carlo Tree Search (UCT) over the best candidate cells of each board
+  #  Each rollout samples a ship layout that agrees with the board (sample_fleet_layout), walks down the tree with UCT,
+  #  adds one new node and then plays greedy shot_scores moves up to UCT_HORIZON shots from the current board.
+  #  The reward is the share of those shots that hit. Stops after UCT_ROLLOUTS rollouts or UCT_TIME seconds.
+  #  returns a boolean, True for ship hit or False for ship not hit
+  def ai_uct_move(self):
+    deadline = None if UCT_TIME is None else time.time() + UCT_TIME
+    row, col, _ = self.uct_search(UCT_ROLLOUTS, deadline)
+    with PROFILER.phase("apply"): return self.env.fire(row, col)
+  # ai_mcts_move's choice without making it, sampling batches of move_sim boards until the deadline (a time.time() value)
+  #  returns (row, col, samples), samples is the number of simulated boards (0 when the move comes from the hit stack)
+  def best_move(self, deadline: float) -> tuple[int, int, int]:
+    # choose_move's hit stack without the cells already struck
+    hit_stack = [cell for cell in self.env.hit_stack if not self.env.board.is_shot(*cell)]
+    if self.env.target_mode and hit_stack:
+      row, col = hit_stack[-1]
+      return row, col, 0
+    total = np.zeros((GRID_SIZE, GRID_SIZE))
+    total_weight = 0
+    samples = 0
+    while samples == 0 or time.time() < deadline:
+      simulations, weights = self.simulate_ships()
+      total += np.tensordot(weights, simulations, axes=1)
+      total_weight += weights.sum()
+      samples += self.move_sim
+    percentages = total / total_weight
+    percentages[Bitboard.array(self.env.board.shot()).reshape(GRID_SIZE, GRID_SIZE)] = -1
+    row, col = np.unravel_index(np.argmax(percentages), percentages.shape)
+    return int(row), int(col), samples
+  # Searches the tree for up to max_rollouts rollouts or until the deadline (a time.time() value, None for no deadline)
+  #  returns (row, col, rollouts) of the most visited candidate and the number of rollouts done
+  def uct_search(self, max_rollouts: int, deadline=None) -> tuple[int, int, int]:
+    root_board = self.env.board
+    root_key = board_key(root_board, self.env.ships_remaining)
+    # Only boards that can still follow from this one are worth keeping
+    root_shot = root_board.shot()
+    self.table = {key: node for key, node in self.table.items()
+                  if key[0] & root_shot == root_board.hits and key[1] & root_shot == root_board.misses}
+    if root_key not in self.table: self.table[root_key] = UCTNode(root_board, self.env.ships_remaining)
+    root = self.table[root_key]
+
+    rollouts = 0
+    while rollouts < max_rollouts:
+      if deadline is not None and time.time() > deadline: break
+      if len(root.candidates) == 0: break
+      with PROFILER.phase("sample"): layout = sample_fleet_layout(root_board, self.env.ships_remaining)
+      if layout is None: break
+      board = Bitboard(sum(layout.values()), root_board.hits, root_board.misses, root_board.sunk)
+      remaining = dict(layout)
+      node = root
+      path = []
+      shots = 0
+      hits = 0
+      # Selection and expansion
+      with PROFILER.phase("select"):
+        while True:
+          choice = node.select()
+          path.append((node, choice))
+          hits += self.simulate_shot(board, remaining, divmod(int(node.candidates[choice]), GRID_SIZE))
+          shots += 1
+          if not remaining or shots >= UCT_HORIZON: break
+          key = board_key(board, remaining)
+          if key not in self.table:
+            self.table[key] = UCTNode(board, remaining)
+            break
+          node = self.table[key]
+          if len(node.candidates) == 0: break
+      # Rollout with the fast policy
+      while remaining and shots < UCT_HORIZON:
+        with PROFILER.phase("score"): scores = shot_scores(board, remaining)
+        hits += self.simulate_shot(board, remaining, divmod(int(np.argmax(scores)), GRID_SIZE))
+        shots += 1
+      for node, choice in path: node.update(choice, hits / UCT_HORIZON)
+      rollouts += 1
+    PROFILER.count("rollouts", rollouts)
+
+    # Most visited candidate, or the best shot_scores cell if there was nothing to search
+    if root.total_visits > 0: cell = int(root.candidates[np.argmax(root.visits)])
+    else: cell = int(np.argmax(shot_scores(root_board, self.env.ships_remaining)))
+    row, col = divmod(cell, GRID_SIZE)
+    return row, col, rollouts
+  # Strike a cell of a simulated board, remaining maps each unsunk ship of the simulated layout to its mask
+  #  returns 1 for ship hit or 0 for ship not hit
+  def simulate_shot(self, board: Bitboard, remaining: dict, cell: tuple[int, int]) -> int:
+    if not board.fire(*cell): return 0
+    for ship_name, ship_mask in remaining.items():
+      if board.is_sunk(ship_mask):
+        board.sunk |= ship_mask
+        del remaining[ship_name]
+        break
+    return 1
+
   def update_hit_stack(self, row, col):
     directions = [(-1, 0), (0, -1), (1, 0), (0, 1)]
     for dr, dc in directions:
       nr, nc = row + dr, col + dc
-      if self.env.is_in_bounds(nr, nc) and self.env.state[nr][nc] not in ('X', 'O'):
+      if self.env.is_in_bounds(nr, nc) and not self.env.board.is_shot(nr, nc):
         self.env.hit_stack.append((nr, nc))
     #print("Updated hit stack:", self.env.hit_stack)
 
@@ -169,26 +936,26 @@ class mcts:
         r2, c2 = seq[-1]
         if (r1 == r2 and col in range(min(c1, c2), max(c1, c2) + 1)) or (c1 == c2 and row in range(min(r1, r2), max(r1, r2) + 1)):
           if r1 == r2:  # Horizontal sequence
-            if c1 > 0 and self.env.state[r1][c1 - 1] not in ('X', 'O'):
+            if c1 > 0 and not self.env.board.is_shot(r1, c1 - 1):
               self.env.hit_stack.append((r1, c1 - 1))
-            if c2 < GRID_SIZE - 1 and self.env.state[r1][c2 + 1] not in ('X', 'O'):
+            if c2 < GRID_SIZE - 1 and not self.env.board.is_shot(r1, c2 + 1):
               self.env.hit_stack.append((r1, c2 + 1))
           elif c1 == c2:  # Vertical sequence
-            if r1 > 0 and self.env.state[r1 - 1][c1] not in ('X', 'O'):
+            if r1 > 0 and not self.env.board.is_shot(r1 - 1, c1):
               self.env.hit_stack.append((r1 - 1, c1))
-            if r2 < GRID_SIZE - 1 and self.env.state[r2 + 1][c1] not in ('X', 'O'):
+            if r2 < GRID_SIZE - 1 and not self.env.board.is_shot(r2 + 1, c1):
               self.env.hit_stack.append((r2 + 1, c1))
     #print("Updated hit stack after miss:", self.env.hit_stack)
 
   def get_hit_sequences(self):
-    hits = [(r, c) for r in range(GRID_SIZE) for c in range(GRID_SIZE) if self.env.state[r][c] == 'X']
+    hits = [divmod(int(cell), GRID_SIZE) for cell in np.flatnonzero(Bitboard.array(self.env.board.hits))]
     sequences = []
     for hit in hits:
       r, c = hit
       # Check horizontal sequence
       horiz_seq = [(r, c)]
       for dc in range(1, GRID_SIZE - c):
-        if self.env.state[r][c + dc] == 'X':
+        if self.env.board.is_hit(r, c + dc):
           horiz_seq.append((r, c + dc))
         else:
           break
@@ -197,7 +964,7 @@ class mcts:
       # Check vertical sequence
       vert_seq = [(r, c)]
       for dr in range(1, GRID_SIZE - r):
-        if self.env.state[r + dr][c] == 'X':
+        if self.env.board.is_hit(r + dr, c):
           vert_seq.append((r + dr, c))
         else:
           break
@@ -205,6 +972,337 @@ class mcts:
         sequences.append(vert_seq)
     return sequences
 
+# Simulated human player, searches for ships then targets and destroys the ships it hits
+#  probable chooses the search pattern, True for the most probable cell and False for the even (checkerboard) strategy
+#  Each board owns its own HumanSim, so any number of simulated human games can be played at once
+class HumanSim:
+  def __init__(self, env):
+    self.env = env
+    # Next cell of the checkerboard search
+    self.rowNum = 0
+    self.colNum = 0
+    # Cells to try next as (row, col, direction), direction is where the cell is from the hit that added it
+    self.targetStack = []
+    # Hits that are not yet known to be part of a sunk ship as (row, col, direction)
+    self.hitMarkers = []
+    self.targetMode = False
+    self.destroyMode = False
+    self.clearHitMarkers = False
+    # Name of the ship sunk by the last move, set by BoardState.check_ship_sunk
+    self.sunkResult = ""
+    self.isAppended = False
+    # plan of the move between choose and apply
+    self.pending = None
+
+  # Choose a coordinate to attack based on a simulated human style of play
+  #  returns a boolean, True for ship hit or False for ship not hit
+  def move(self, probable: bool) -> bool:
+    with PROFILER.phase("select"): move = self.choose(probable)
+    if move is None: return None
+    with PROFILER.phase("apply"): return self.apply(self.env.fire(*move))
+  # First step of a move: the cell to strike, or None if this move does not strike anything
+  def choose(self, probable: bool):
+    self.pending = self.plan(probable)
+    try:
+      row, col = next(self.pending)
+    except StopIteration:
+      self.pending = None
+      return None
+    return int(row), int(col)
+  # Second step of a move: record whether the chosen cell was a hit
+  #  returns a boolean, True for ship hit or False for ship not hit
+  def apply(self, hit: bool) -> bool:
+    try:
+      self.pending.send(hit)
+    except StopIteration as result:
+      return result.value
+    finally:
+      self.pending = None
+  # The move the simulated human would make next, without making it or changing its state
+  #  returns (row, col, samples), samples is always 0 as nothing is simulated (None for row and col if it would not shoot)
+  def best_move(self, probable: bool) -> tuple[int, int, int]:
+    trial = copy.copy(self)
+    trial.targetStack = self.targetStack[:]
+    trial.hitMarkers = self.hitMarkers[:]
+    # The random fallback of plan works on the board's target_mode and hit_stack, which the trial shares
+    target_mode, hit_stack = self.env.target_mode, self.env.hit_stack[:]
+    try:
+      row, col = next(trial.plan(probable))
+    except StopIteration:
+      return None, None, 0
+    finally:
+      self.env.target_mode, self.env.hit_stack = target_mode, hit_stack
+    return int(row), int(col), 0
+  # Steps of one move as a generator: yields the (row, col) to strike and is sent back True for hit or False for miss
+  #  Everything before the yield chooses the cell and everything after it records the result,
+  #  the generator's return value is move's return value
+  def plan(self, probable: bool):
+    #POTENTIAL IMPROVEMENT FOR LATER: Currently, target mode checks right, left, down, and then up.
+    #It is more efficient to check either vertical after checking right.
+    #This is because hitting in a checkerboard pattern goes left to right in our implementation and the chance that 
+    #a ship size smaller than 3 is on the left of the hit tile after hitting right is smaller than the chance of it being a vertical ship
+    #if we implemented the checkerboard pattern to iterate up down the problem would be the opposite.
+    # print("target stack")
+    # print(self.targetStack)
+    #disables destroying of ships and clears the stack of tiles to hit if the ship is destroyed statement comes up
+    if (self.sunkResult != ""):
+      if(self.destroyMode and len(self.targetStack) != 0 and self.isAppended):
+        self.targetStack.pop() #popping to ge rid of the choice the destroy mode added last call of human_sim_move
+      #latestDirection = self.hitMarkers[len(self.hitMarkers) -1][2]
+      self.destroyMode = False
+      shipSunkList = self.env.locations_destroyed[len(self.env.locations_destroyed) - 1]
+      # print("destroyed ship coords")
+      # print(shipSunkList)
+      # print("hit markers")
+      # print(self.hitMarkers)
+      #since a ship was destroyed, remove all hit markers releated to that destroyed ship
+      listTemp = []
+      for x in self.hitMarkers:
+        if(not([x[0], x[1]] in shipSunkList)):
+          listTemp.append(x)
+          #print("keep " + str(x))
+        # else:
+          #print("remove " + str(x))
+      self.hitMarkers = listTemp
+      # print("hitmarkers afterwards")
+      # print(self.hitMarkers)
+      #i = len(self.hitMarkers) -1
+      #while(i >= 0):
+        #if(self.hitMarkers[i][2] == latestDirection):
+          #self.hitMarkers.pop()
+        #else:
+          #break
+        #i -= 1
+      #self.hitMarkers.pop() #removing the hitmarker that acts as the pivot point between the two cardinal directions
+      
+      
+      if(len(self.hitMarkers) == 0): # only clear when there are no more hitmarkers to investigate
+        self.targetStack = [] #clear list
+        #go back to searching we used all the info we had on the destroyed ships
+        self.clearHitMarkers = False
+        self.destroyMode = False
+        self.targetMode = False
+      else:
+        self.clearHitMarkers = True
+        self.check_hit_markers()
+      self.sunkResult = ""
+      # print("target stack afterwards")
+      # print(self.targetStack)
+    #enabled if the algorithm hits any ship part
+    #adds adjacent tiles to the stack to iterate through
+    if (self.targetMode):
+      #print("self.targetMode")
+      isBlocked = False
+      move = self.targetStack.pop()
+      if not self.env.board.is_shot(move[0], move[1]):
+        if (yield (move[0], move[1])):
+          self.hitMarkers.append(move)
+          if (move[2] == "up"):
+            if (move[0] - 1 >= 0 and not self.env.board.is_shot(move[0] - 1, move[1])):
+              self.targetStack.append((move[0] - 1, move[1], "up"))
+            else:
+              isBlocked = True
+          elif (move[2] == "down"):
+            if (move[0] + 1 < GRID_SIZE and not self.env.board.is_shot(move[0] + 1, move[1])):
+              self.targetStack.append((move[0] + 1, move[1], "down"))
+            else:
+              isBlocked = True
+          elif (move[2] == "left"):
+            if (move[1] - 1 >= 0 and not self.env.board.is_shot(move[0], move[1] - 1)):
+              self.targetStack.append((move[0], move[1] - 1, "left"))
+            else:
+              isBlocked = True
+          else:  # right
+            if (move[1] + 1 < GRID_SIZE and not self.env.board.is_shot(move[0], move[1] + 1)):
+              self.targetStack.append((move[0], move[1] + 1, "right"))
+            else:
+              isBlocked = True
+          if(isBlocked):
+            self.targetMode = False
+            self.clearHitMarkers = True
+            self.check_hit_markers()
+          else:
+            self.targetMode = False # turns off target mode and enable destroy mode to pop the stack and destroy ship
+            self.destroyMode = True
+          return True
+        else:  # is ~
+          return False
+    elif (self.destroyMode):
+      #print("self.destroyMode")
+      while(True):
+        self.isAppended = False
+        move = self.targetStack.pop() #grabs latest tile and hits
+        if not self.env.board.is_miss(move[0], move[1]):
+          if (move[2] == "up"):
+            if (move[0] - 1 >= 0 and not self.env.board.is_shot(move[0] - 1, move[1])):
+              self.targetStack.append((move[0] - 1, move[1], "up"))
+              self.isAppended = True
+          elif (move[2] == "down"):
+            if (move[0] + 1 < GRID_SIZE and not self.env.board.is_shot(move[0] + 1, move[1])):
+              self.targetStack.append((move[0] + 1, move[1], "down"))
+              self.isAppended = True
+          elif (move[2] == "left"):
+            if (move[1] - 1 >= 0 and not self.env.board.is_shot(move[0], move[1] - 1)):
+              self.targetStack.append((move[0], move[1] - 1, "left"))
+              self.isAppended = True
+          else:  # right
+            if (move[1] + 1 < GRID_SIZE and not self.env.board.is_shot(move[0], move[1] + 1)):
+              self.targetStack.append((move[0], move[1] + 1, "right"))
+              self.isAppended = True
+          if not self.env.board.is_hit(move[0], move[1]):
+            if (yield (move[0], move[1])):
+              self.hitMarkers.append(move)
+              return True
+            else:  # miss
+              if(self.isAppended):
+                #algorithm was certain it can destroy a ship in this particular cardinal direction. So this must mean the algorithm has hit multiple ships lined up together 
+                # remove latest append since we have discovered the current move is a miss 
+                self.targetStack.pop() 
+              else: # ELSE BODY IS A NEW ADDITION
+                self.clearHitMarkers=True
+                self.check_hit_markers()
+              self.destroyMode = False
+              self.clearHitMarkers = True
+              self.check_hit_markers()
+              return False
+    elif(self.clearHitMarkers):
+      #print("self.clearHitMarkers")
+      #behave similar to target mode: pop decisions until a hit is found. Then destroy that ship with destroy mode
+      move = self.targetStack.pop()
+      self.isAppended = False
+      #if(removeFromStackCount != 0):
+        #removeFromStackCount -= 1
+      while(self.env.board.is_shot(move[0], move[1])):
+        move = self.targetStack.pop()
+      if((yield (move[0], move[1]))):
+        self.hitMarkers.append(move)
+        #for i in range(removeFromStackCount):
+          #self.targetStack.pop()
+        if(move[2] == "up" and move[0] - 1 >= 0 and not self.env.board.is_shot(move[0] - 1, move[1])):
+          #if(self.fog_of_war[move[0] + 1][move[1]] == '~' and move[0] + 1 <=9):
+            #self.targetStack.append((move[0] + 1, move[1], "down"))
+          self.targetStack.append((move[0] - 1, move[1], "up"))
+          self.isAppended = True
+        elif(move[2] == "down" and move[0] + 1 < GRID_SIZE and not self.env.board.is_shot(move[0] + 1, move[1])):
+          #if(self.fog_of_war[move[0] - 1][move[1]] == '~' and move[0] - 1 >= 0):
+            #self.targetStack.append((move[0] - 1, move[1], "up"))
+          self.targetStack.append((move[0] + 1, move[1], "down"))
+          self.isAppended = True
+        elif(move[2] == "left" and move[1] - 1 >= 0 and not self.env.board.is_shot(move[0], move[1] - 1)):
+          #if(self.fog_of_war[move[0]][move[1] + 1] == '~' and move[1] + 1 <= 9):
+            #self.targetStack.append((move[0], move[1] + 1, "right"))
+          self.targetStack.append((move[0], move[1] - 1, "left"))
+          self.isAppended = True
+        elif(move[2] == "right" and move[1] + 1 < GRID_SIZE and not self.env.board.is_shot(move[0], move[1] + 1)): #right
+          #if(self.fog_of_war[move[0]][move[1] - 1] == '~' and move[1] - 1 >= 0):
+            #self.targetStack.append((move[0], move[1] - 1, "left"))
+          self.targetStack.append((move[0], move[1] + 1, "right"))
+          self.isAppended = True
+        self.clearHitMarkers = False
+        self.destroyMode = True
+        #loop gets rid of choices added by set up target mode during clear hit marker stage since we don't need to consider the other options we haven't popped yet
+
+        return True
+      #is ~
+      return False
+
+    else: #this is the search pattern. Hits tiles in a checkerboard style
+      #print("search")
+      if probable:
+        decision = self.env.get_max_probability()
+        if not self.env.board.is_shot(decision[0], decision[1]):
+          if (yield (decision[0], decision[1])):
+            self.hitMarkers.append((decision[0], decision[1], "start"))
+            self.targetMode = True
+            self.set_up_target_mode(decision[0], decision[1])
+            return True
+          return False
+      else:
+        while(True):
+          if not self.env.board.is_shot(self.rowNum, self.colNum):
+            if (yield (self.rowNum, self.colNum)):
+              self.targetMode = True
+              self.hitMarkers.append((self.rowNum, self.colNum, "start"))
+              self.set_up_target_mode(self.rowNum, self.colNum)
+              return True
+            self.next_tile()
+            return False
+        
+          self.next_tile()
+
+      if self.env.target_mode and self.env.hit_stack:
+          move = self.env.hit_stack.pop()
+      else:
+          self.env.target_mode = False
+          while True:
+              move = (random.randint(0, GRID_SIZE - 1), random.randint(0, GRID_SIZE - 1))
+              if not self.env.board.is_shot(move[0], move[1]):
+                  break
+
+      row, col = move
+
+      if (yield (row, col)):
+          self.env.target_mode = True
+
+          if row > 0 and not self.env.board.is_shot(row - 1, col):
+              self.env.hit_stack.append((row - 1, col))
+          if row < GRID_SIZE - 1 and not self.env.board.is_shot(row + 1, col):
+              self.env.hit_stack.append((row + 1, col))
+          if col > 0 and not self.env.board.is_shot(row, col - 1):
+              self.env.hit_stack.append((row, col - 1))
+          if col < GRID_SIZE - 1 and not self.env.board.is_shot(row, col + 1):
+              self.env.hit_stack.append((row, col + 1))
+
+          return True
+      else:
+          return False
+  # Human sim helpers
+  def next_tile(self) -> None:
+    self.colNum += 2
+    if self.colNum >= GRID_SIZE:
+      self.rowNum += 1
+      if self.rowNum % 2 == 0:
+        self.colNum = 0
+      else:
+        self.colNum = 1
+  def next_tile_r(self) -> None:
+    self.colNum -= 2
+    if self.colNum < 0:
+      self.rowNum -= 1
+      # Last column of the row's checkerboard color
+      self.colNum = GRID_SIZE - 1 - (GRID_SIZE - 1 + self.rowNum) % 2
+  def set_up_target_mode(self, rowNum, colNum) -> int:
+    count = 0
+    # above tile
+    if (rowNum - 1 >= 0 and not self.env.board.is_shot(rowNum - 1, colNum)):
+      self.targetStack.append((rowNum - 1, colNum, "up"))
+      count += 1
+    # below tile
+    if (rowNum + 1 < GRID_SIZE and not self.env.board.is_shot(rowNum + 1, colNum)):
+      self.targetStack.append((rowNum + 1, colNum, "down"))
+      count += 1
+    # left tile
+    if (colNum - 1 >= 0 and not self.env.board.is_shot(rowNum, colNum - 1)):
+      self.targetStack.append((rowNum, colNum - 1, "left"))
+      count += 1
+    # right tile
+    if (colNum + 1 < GRID_SIZE and not self.env.board.is_shot(rowNum, colNum + 1)):
+      self.targetStack.append((rowNum, colNum + 1, "right"))
+      count += 1
+    return count # count is only for knowing how many choices to remove during clear hit marker stage
+  def check_hit_markers(self):
+    #marker = self.hitMarkers.pop()
+    i = 1
+    while(i <= len(self.hitMarkers)):
+      marker = self.hitMarkers[len(self.hitMarkers) - i]
+      if(marker[2] != "start"):
+        result = self.set_up_target_mode(marker[0], marker[1])
+        if(result != 0):
+          break
+      else:
+        break
+      i += 1
+
 # Holds all information about a player's board
 class BoardState:
   # state represents a player's view of their own board
@@ -216,14 +1314,25 @@ class BoardState:
   # ships_remaining will contain the names of ships that have yet to be sunk
   # locations_destroyed is an array of ship location arrays that hold grid location arrays as ints
   # searching tells the NN whether to use heatmap or probability grid, set in transform_data
+  # board holds the ships, hits, misses and sunk cells as bitboards, state and fog_of_war are grid views of it
+  # placements holds the PlacementCounts of the shots on board, built on first use and updated by fire
+  # ship_masks has the same keys as ships_dict with each ship's cells as a bitboard mask
+  # ship_cells, cells_afloat and sunk_pending index the ships for fire and check_ship_sunk (see index_ships)
   def __init__(self, state=None, fog_of_war=None, ships=None, ships_dict=None, 
                ships_remaining=None, locations_destroyed=None, samples=100, searching=None, network=None):
-    self.state = state if state is not None else [['~'] * GRID_SIZE for _ in range(GRID_SIZE)]
-    self.fog_of_war = fog_of_war if fog_of_war is not None else [['~'] * GRID_SIZE for _ in range(GRID_SIZE)]
+    self.board = Bitboard()
+    self._state_view = None
+    self._fog_view = None
+    self._placements = None
     self.ships = ships if ships is not None else []
     self.ships_dict = {} if ships_dict is None else {k: v[:] for k, v in ships_dict.items()}
+    self.ship_masks = {k: Bitboard.cells(v) for k, v in self.ships_dict.items()}
+    if state is not None: self.state = state
+    if fog_of_war is not None: self.fog_of_war = fog_of_war
+    self.index_ships()
     self.ships_remaining = list(SHIPS_NAMES) if ships_remaining is None else list(ships_remaining)
     self.locations_destroyed = [] if locations_destroyed is None else list(locations_destroyed)
+    for ship_locations in self.locations_destroyed: self.board.sunk |= Bitboard.cells(ship_locations)
     self.searching = True if searching is None else searching
     self.network = network
 
@@ -233,32 +1342,88 @@ class BoardState:
     self.random_mode = True
     self.samples = samples
     self.mcts = mcts(self, samples)
+    self.human_sim = HumanSim(self)
+
+  """BOARD VIEWS"""
+  # state and fog_of_war are character grids built from the bitboard the first time they are read after a change
+  #  they are read-only views: change the board through fire and write_ship_to_board, or assign a whole new grid
+  @property
+  def state(self) -> list[list[str]]:
+    if self._state_view is None: self._state_view = self.board.state_grid()
+    return self._state_view
+  @state.setter
+  def state(self, grid) -> None:
+    self.board.load_state(grid)
+    self._state_view = self._fog_view = None
+    self._placements = None
+    self.index_ships()
+  @property
+  def fog_of_war(self) -> list[list[str]]:
+    if self._fog_view is None: self._fog_view = self.board.fog_grid()
+    return self._fog_view
+  @fog_of_war.setter
+  def fog_of_war(self, grid) -> None:
+    self.board.load_fog(grid)
+    self._state_view = self._fog_view = None
+    self._placements = None
+    self.index_ships()
+  @property
+  def placements(self) -> PlacementCounts:
+    if self._placements is None: self._placements = PlacementCounts(self.board.shot())
+    return self._placements
+  # Strike a cell of this board, X for hit and O for miss on both the fog of war and state views
+  #  returns a boolean, True for ship hit or False for ship not hit
+  def fire(self, row: int, col: int) -> bool:
+    cell = int(row * GRID_SIZE + col)
+    new_hit = not self.board.hits >> cell & 1
+    hit = self.board.fire(row, col)
+    if self._state_view is not None: self._state_view[row][col] = 'X' if hit else 'O'
+    if self._fog_view is not None: self._fog_view[row][col] = 'X' if hit else 'O'
+    if self._placements is not None: self._placements.shoot(row, col)
+    # A new hit on a ship leaves one cell less of it afloat
+    if hit and new_hit and cell in self.ship_cells:
+      ship_name = self.ship_cells[cell]
+      self.cells_afloat[ship_name] -= 1
+      if self.cells_afloat[ship_name] == 0: self.sunk_pending.add(ship_name)
+    return hit
+  # Cell index of the ships: ship_cells maps each ship cell (row * GRID_SIZE + col) to the ship's name,
+  #  cells_afloat counts the cells of each ship that are not hit yet (fire counts them down, so a sinking is found
+  #  without looking at the ship's other cells) and sunk_pending holds the ships sunk but not yet reported by check_ship_sunk
+  def index_ships(self) -> None:
+    self.ship_cells = {}
+    self.cells_afloat = {}
+    self.sunk_pending = set()
+    for ship_name, ship_mask in self.ship_masks.items(): self.index_ship(ship_name, ship_mask)
+  # Add a ship (or move it, see mark_sunk) to ship_masks and the cell index
+  def index_ship(self, ship_name: str, ship_mask: int) -> None:
+    self.ship_masks[ship_name] = ship_mask
+    # Set bits of the mask, lowest first
+    mask = ship_mask
+    while mask:
+      self.ship_cells[(mask & -mask).bit_length() - 1] = ship_name
+      mask &= mask - 1
+    self.cells_afloat[ship_name] = bin(ship_mask & ~self.board.hits).count("1")
+    if self.cells_afloat[ship_name] == 0: self.sunk_pending.add(ship_name)
+    else: self.sunk_pending.discard(ship_name)
 
   """SHIP PLACEMENT HELPERS"""
   # Takes coordinate and ship size, returns list of possible swing coordinates as strings
   #  Example return: ["A0", "J4", "B2"]
   def get_allowed_swing_points(self, anchor_row: int, anchor_col: int, ship_size: int) -> list[str]:
     possible_positions = []
-    swing_down_allowed = swing_right_allowed = swing_up_allowed = swing_left_allowed = False
 
     # The offset of 1 accounts for only needing to be ship_size-1 spots away from the anchor
     right_swing_point = anchor_col+(ship_size-1)
     down_swing_point = anchor_row+(ship_size-1)
     left_swing_point = anchor_col-(ship_size-1)
     up_swing_point = anchor_row-(ship_size-1)
-    
-    # If down swing is in the grid
-    # swing_down_allowed is set to true if all grid spaces from the anchor to swing point are ~
-    if (down_swing_point <= 9): swing_down_allowed = all(self.state[n][anchor_col] == '~' for n in range(anchor_row+1, down_swing_point+1))
-    # If right swing is in the grid
-    # swing_right_allowed is set to true if all grid spaces from the anchor to swing point are ~
-    if (right_swing_point <= 9): swing_right_allowed = all(self.state[anchor_row][n] == '~' for n in range(anchor_col+1, right_swing_point+1))
-    # If up swing is in the grid
-    # swing_up_allowed is set to true if all grid spaces from the anchor to swing point are ~
-    if (up_swing_point >= 0): swing_up_allowed = all(self.state[n][anchor_col] == '~' for n in range(up_swing_point, anchor_row))
-    # If left swing is in the grid
-    # swing_left_allowed is set to true if all grid spaces from the anchor to swing point are ~
-    if (left_swing_point >= 0): swing_left_allowed = all(self.state[anchor_row][n] == '~' for n in range(left_swing_point, anchor_col))
+
+    # A swing is allowed if it is in the grid (placement index is not -1) and
+    #  all grid spaces from the anchor to swing point are ~ (one mask AND per direction)
+    table = get_placement_table(ship_size)
+    used = (self.board.ships | self.board.shot()) & ~Bitboard.cell(anchor_row, anchor_col)
+    swing_down_allowed, swing_right_allowed, swing_up_allowed, swing_left_allowed = (
+      placement >= 0 and table.bits[placement] & used == 0 for placement in table.anchor_table[anchor_row * GRID_SIZE + anchor_col])
 
     # Append swing locations depending on if they are allowed
     if (swing_down_allowed): possible_positions.append(INT_TO_STR[down_swing_point] + str(anchor_col))
@@ -310,7 +1475,7 @@ class BoardState:
       # If there are no possible swing points from the chosen anchor, then reset anchor
       if len(valid_swing_points) == 0: continue
       # Place the anchor point on the board
-      self.state[anchor_row][anchor_col] = PIECE_CHAR
+      self.write_ship_to_board(anchor_row, anchor_col, anchor_row, anchor_col)
       # Prompt user to choose a swing point
       swing_row, swing_col = self.get_swing_point(ship, valid_swing_points)
       # Place ship onto board, set ship_coordinates to list of grid locations that ship was placed into
@@ -319,6 +1484,7 @@ class BoardState:
       self.ships.append(ship_coordinates)
       # Append {ship_name: ship_coordinates} to dictionary
       self.ships_dict.update({ship: ship_coordinates})
+      self.index_ship(ship, Bitboard.cells(ship_coordinates))
       # Ship successfully placed onto board
       break
   # Randomly place down a single ship
@@ -329,7 +1495,7 @@ class BoardState:
       while True:
         random_row = random.randint(0, GRID_SIZE - 1)
         random_col = random.randint(0, GRID_SIZE - 1)
-        if self.state[random_row][random_col] != '#':
+        if not self.board.is_ship(random_row, random_col):
           # Found a coordinate not on top of a ship
           anchor_row, anchor_col = random_row, random_col
           break
@@ -338,19 +1504,31 @@ class BoardState:
       # If there are no possible swing points from the chosen anchor, then reset anchor
       if len(valid_swing_points) == 0: continue
       # Place the anchor point on the board
-      self.state[anchor_row][anchor_col] = PIECE_CHAR
+      self.write_ship_to_board(anchor_row, anchor_col, anchor_row, anchor_col)
       # Set secondary point (orientations that are in bounds and do not overlap other ships)
       swing_point = valid_swing_points[random.randint(0, len(valid_swing_points) - 1)]
-      swing_row, swing_col = (STR_TO_INT[swing_point[0]], int(swing_point[1]))
+      swing_row, swing_col = input_to_coordinate(swing_point)
       # Place ship onto board, set ship_coordinates to list of grid locations that ship was placed into
       ship_coordinates = self.write_ship_to_board(anchor_row, anchor_col, swing_row, swing_col)
       # Append list of coordinates to ships array
       self.ships.append(ship_coordinates)
       # Append {ship_name: ship_coordinates} to dictionary
       self.ships_dict.update({ship: ship_coordinates})
+      self.index_ship(ship, Bitboard.cells(ship_coordinates))
       # Ship successfully placed onto board
       break
 
+  # Place every ship on its placement of a random_fleet_layouts layout, on a board without ships
+  def place_fleet(self, layout) -> None:
+    for ship_name, placement in zip(SHIPS_NAMES, layout):
+      table = get_placement_table(SHIPS_SIZES[ship_name])
+      ship_coordinates = [[n // GRID_SIZE, n % GRID_SIZE] for n in table.cells[placement]]
+      self.board.ships |= table.bits[placement]
+      self.ships.append(ship_coordinates)
+      self.ships_dict.update({ship_name: ship_coordinates})
+      self.index_ship(ship_name, table.bits[placement])
+    self._state_view = None
+
   """MISC FUNCTIONS"""
   # Write the ship's characters onto the board
   #  a_x and a_y represent anchor coordinate, s_x and s_y represent swing coordinate
@@ -360,59 +1538,52 @@ class BoardState:
     # Horizontal orientation
     if a_y == s_y: 
       for x in range(min(a_x, s_x), max(a_x, s_x)+1):
-        self.state[x][a_y] = PIECE_CHAR
         ship_coordinates.append([x,a_y])
     # Vertical orientation
     if a_x == s_x:
       for y in range(min(a_y, s_y), max(a_y, s_y)+1):
-        self.state[a_x][y] = PIECE_CHAR
         ship_coordinates.append([a_x,y])
+    self.board.ships |= Bitboard.cells(ship_coordinates)
+    self._state_view = None
     return ship_coordinates
   # Check if a ship has been sunk based on previous move
   #  returns the name of the sunk ship, if no sinks returns an empty string
   def check_ship_sunk(self) -> str:
-    # For each pair of name and locations of ships (goes through all ships)
-    for ship_name, ship_locations in self.ships_dict.items():
-      # If the ship has been sunk
-      if all(self.state[row][col] == 'X' for row, col in ship_locations):
-        self.locations_destroyed.append(ship_locations)
-        del self.ships_dict[ship_name]
-        self.ships_remaining.remove(ship_name)
-        return ship_name
-    return ""
+    with PROFILER.phase("check_ship_sunk"):
+      # fire keeps sunk_pending up to date, so most checks end here
+      if len(self.sunk_pending) == 0: return ""
+      # The first sunk ship in placement order, if more than one sank since the last check
+      ship_name = next(ship_name for ship_name in self.ship_masks if ship_name in self.sunk_pending)
+      self.sunk_pending.remove(ship_name)
+      ship_mask = self.ship_masks[ship_name]
+      self.locations_destroyed.append(self.ships_dict[ship_name])
+      self.board.sunk |= ship_mask
+      del self.ships_dict[ship_name]
+      del self.ship_masks[ship_name]
+      self.ships_remaining.remove(ship_name)
+      # The simulated human clears its hit markers of this ship on its next move
+      self.human_sim.sunkResult = ship_name
+      return ship_name
   # Add labels to the board representation
   def print_grid(self, fog_of_war: bool) -> None:
-    col_titles = [' '] + [str(i) for i in range(GRID_SIZE)]
-    row_titles = ["A", "B", "C", "D", "E", "F", "G", "H", "I", "J"]
-    if fog_of_war: print(" ".join(col_titles) + "\n" + "\n".join([row_titles[i] + " " + " ".join(self.fog_of_war[i]) for i in range(GRID_SIZE)]))
-    else: print(" ".join(col_titles) + "\n" + "\n".join([row_titles[i] + " " + " ".join(self.state[i]) for i in range(GRID_SIZE)]))
+    # Labels are padded to the widest one, boards of more than 10 columns or 26 rows get wider cells
+    row_width = len(INT_TO_STR[GRID_SIZE - 1])
+    col_width = len(str(GRID_SIZE - 1))
+    grid = self.fog_of_war if fog_of_war else self.state
+    col_titles = [' ' * row_width] + [str(i).rjust(col_width) for i in range(GRID_SIZE)]
+    print(" ".join(col_titles) + "\n" + "\n".join([INT_TO_STR[i].ljust(row_width) + " " + " ".join(cell.rjust(col_width) for cell in grid[i]) for i in range(GRID_SIZE)]))
   # Reset the board (for testing AI efficiency)
   def reset(self) -> None:
-    global rowNum
-    global colNum
-    global targetStack
-    global targetMode
-    global destroyMode
-    global humanSimSunkResult
-    global hitMarkers
-    global clearHitMarkers
-    global isAppended
-    self.state = [['~'] * GRID_SIZE for _ in range(GRID_SIZE)]
-    self.fog_of_war = [['~'] * GRID_SIZE for _ in range(GRID_SIZE)]
+    self.board = Bitboard()
+    self._state_view = self._fog_view = None
+    self._placements = None
     self.ships = []
     self.ships_dict = {}
+    self.ship_masks = {}
+    self.index_ships()
     self.ships_remaining = list(SHIPS_NAMES)
     self.locations_destroyed = []
-    rowNum = 0
-    colNum = 0
-    targetStack = []
-    hitMarkers = []
-    targetMode = False
-    destroyMode = False
-    clearHitMarkers = False
-    humanSimSunkResult = ""
-    isAppended = False
-    #reset global variables
+    self.human_sim = HumanSim(self)
 
   """MOVE OPTIONS"""
   # Choose a coordinate to attack
@@ -426,524 +1597,202 @@ class BoardState:
       # Process strike choice
       if input_coordinate == (-1,-1): continue
       strike_row, strike_col = input_coordinate
-      if self.fog_of_war[strike_row][strike_col] != '~': continue
+      if self.board.is_shot(strike_row, strike_col): continue
       else: strike_choice = (strike_row, strike_col)
     # Check if the strike hit or missed, X for hit and O for miss on both the fog of war for enemy display and state for self display
-    if self.state[strike_row][strike_col] == '#': 
-      self.fog_of_war[strike_row][strike_col] = 'X'
-      self.state[strike_row][strike_col] = 'X'
-      return True
-    if self.state[strike_row][strike_col] == '~': 
-      self.fog_of_war[strike_row][strike_col] = 'O'
-      self.state[strike_row][strike_col] = 'O'
-      return False
+    return self.fire(strike_row, strike_col)
   # Make a random move on the board
   #  returns a boolean, True for ship hit or False for ship not hit
   def random_move(self) -> bool:
+    with PROFILER.phase("select"): random_row, random_col = self.choose_random_move()
+    with PROFILER.phase("apply"): return self.fire(random_row, random_col)
+  def choose_random_move(self) -> tuple[int, int]:
     while True:
       random_row = random.randint(0, GRID_SIZE - 1)
       random_col = random.randint(0, GRID_SIZE - 1)
       # Checks fog of war grid to see if the location has yet to be chosen
-      if self.state[random_row][random_col] not in ('X', 'O'):
-        if self.state[random_row][random_col] == '#':           
-          self.fog_of_war[random_row][random_col] = 'X'
-          self.state[random_row][random_col] = 'X'
-          return True
-        if self.state[random_row][random_col] == '~': 
-          self.fog_of_war[random_row][random_col] = 'O'
-          self.state[random_row][random_col] = 'O'
-          return False
-  # Choose a coordinate to attack based on a simulated human style of play (using the even strategy)
+      if not self.board.is_shot(random_row, random_col):
+        return random_row, random_col
+  # Choose a coordinate to attack based on a simulated human style of play (see HumanSim)
+  #  probable is True for the probabilistic strategy and False for the even strategy
   #  returns a boolean, True for ship hit or False for ship not hit
-  def human_sim_move(self) -> bool:
-    #POTENTIAL IMPROVEMENT FOR LATER: Currently, target mode checks right, left, down, and then up.
-    #It is more efficient to check either vertical after checking right.
-    #This is because hitting in a checkerboard pattern goes left to right in our implementation and the chance that 
-    #a ship size smaller than 3 is on the left of the hit tile after hitting right is smaller than the chance of it being a vertical ship
-    #if we implemented the checkerboard pattern to iterate up down the problem would be the opposite.
-    global rowNum
-    global colNum
-    global targetMode
-    global destroyMode
-    global targetStack
-    global hitMarkers
-    global clearHitMarkers
-    global humanSimSunkResult
-    global probableHuman
-    global removeFromStackCount
-    global isAppended
-
-    # print("target stack")
-    # print(targetStack)
-    #disables destroying of ships and clears the stack of tiles to hit if the ship is destroyed statement comes up
-    if (humanSimSunkResult != ""):
-      if(destroyMode and len(targetStack) != 0 and isAppended):
-        targetStack.pop() #popping to ge rid of the choice the destroy mode added last call of human_sim_move
-      #latestDirection = hitMarkers[len(hitMarkers) -1][2]
-      destroyMode = False
-      shipSunkList = self.locations_destroyed[len(self.locations_destroyed) - 1]
-      # print("destroyed ship coords")
-      # print(shipSunkList)
-      # print("hit markers")
-      # print(hitMarkers)
-      #since a ship was destroyed, remove all hit markers releated to that destroyed ship
-      listTemp = []
-      for x in hitMarkers:
-        if(not([x[0], x[1]] in shipSunkList)):
-          listTemp.append(x)
-          #print("keep " + str(x))
-        # else:
-          #print("remove " + str(x))
-      hitMarkers = listTemp
-      # print("hitmarkers afterwards")
-      # print(hitMarkers)
-      #i = len(hitMarkers) -1
-      #while(i >= 0):
-        #if(hitMarkers[i][2] == latestDirection):
-          #hitMarkers.pop()
-        #else:
-          #break
-        #i -= 1
-      #hitMarkers.pop() #removing the hitmarker that acts as the pivot point between the two cardinal directions
-      
-      
-      if(len(hitMarkers) == 0): # only clear when there are no more hitmarkers to investigate
-        targetStack = [] #clear list
-        #go back to searching we used all the info we had on the destroyed ships
-        clearHitMarkers = False
-        destroyMode = False
-        targetMode = False
-      else:
-        clearHitMarkers = True
-        self.check_hit_markers()
-      humanSimSunkResult = ""
-      # print("target stack afterwards")
-      # print(targetStack)
-    #enabled if the algorithm hits any ship part
-    #adds adjacent tiles to the stack to iterate through
-    if (targetMode):
-      #print("targetMode")
-      isBlocked = False
-      move = targetStack.pop()
-      if self.state[move[0]][move[1]] not in ('X', 'O'):
-        if self.state[move[0]][move[1]] == '#':
-          self.fog_of_war[move[0]][move[1]] = 'X'
-          self.state[move[0]][move[1]] = 'X'
-          hitMarkers.append(move)
-          if (move[2] == "up"):
-            if (move[0] - 1 >= 0 and self.state[move[0] - 1][move[1]] not in ('X', 'O')):
-              targetStack.append((move[0] - 1, move[1], "up"))
-            else:
-              isBlocked = True
-          elif (move[2] == "down"):
-            if (move[0] + 1 <= 9 and self.state[move[0] + 1][move[1]] not in ('X', 'O')):
-              targetStack.append((move[0] + 1, move[1], "down"))
-            else:
-              isBlocked = True
-          elif (move[2] == "left"):
-            if (move[1] - 1 >= 0 and self.state[move[0]][move[1] - 1] not in ('X', 'O')):
-              targetStack.append((move[0], move[1] - 1, "left"))
-            else:
-              isBlocked = True
-          else:  # right
-            if (move[1] + 1 <= 9 and self.state[move[0]][move[1] + 1] not in ('X', 'O')):
-              targetStack.append((move[0], move[1] + 1, "right"))
-            else:
-              isBlocked = True
-          if(isBlocked):
-            targetMode = False
-            clearHitMarkers = True
-            self.check_hit_markers()
-          else:
-            targetMode = False # turns off target mode and enable destroy mode to pop the stack and destroy ship
-            destroyMode = True
-          return True
-        else:  # is ~
-          self.fog_of_war[move[0]][move[1]] = 'O'
-          self.state[move[0]][move[1]] = 'O'
-          return False
-    elif (destroyMode):
-      #print("destroyMode")
-      while(True):
-        isAppended = False
-        move = targetStack.pop() #grabs latest tile and hits
-        if self.state[move[0]][move[1]] not in ('O'):
-          if (move[2] == "up"):
-            if (move[0] - 1 >= 0 and self.state[move[0] - 1][move[1]] not in ('O', 'X')):
-              targetStack.append((move[0] - 1, move[1], "up"))
-              isAppended = True
-          elif (move[2] == "down"):
-            if (move[0] + 1 <= 9 and self.state[move[0] + 1][move[1]] not in ('O', 'X')):
-              targetStack.append((move[0] + 1, move[1], "down"))
-              isAppended = True
-          elif (move[2] == "left"):
-            if (move[1] - 1 >= 0 and self.state[move[0]][move[1] - 1] not in ('O', 'X')):
-              targetStack.append((move[0], move[1] - 1, "left"))
-              isAppended = True
-          else:  # right
-            if (move[1] + 1 <= 9 and self.state[move[0]][move[1] + 1] not in ('O', 'X')):
-              targetStack.append((move[0], move[1] + 1, "right"))
-              isAppended = True
-          if self.state[move[0]][move[1]] not in ('X'):
-            if self.state[move[0]][move[1]] == '#':
-              self.fog_of_war[move[0]][move[1]] = 'X'
-              self.state[move[0]][move[1]] = 'X'
-              hitMarkers.append(move)
-              return True
-            else:  # miss
-              self.fog_of_war[move[0]][move[1]] = 'O'
-              self.state[move[0]][move[1]] = 'O'
-              if(isAppended):
-                #algorithm was certain it can destroy a ship in this particular cardinal direction. So this must mean the algorithm has hit multiple ships lined up together 
-                # remove latest append since we have discovered the current move is a miss 
-                targetStack.pop() 
-              else: # ELSE BODY IS A NEW ADDITION
-                clearHitMarkers=True
-                self.check_hit_markers()
-              destroyMode = False
-              clearHitMarkers = True
-              self.check_hit_markers()
-              return False
-    elif(clearHitMarkers):
-      #print("clearHitMarkers")
-      #behave similar to target mode: pop decisions until a hit is found. Then destroy that ship with destroy mode
-      move = targetStack.pop()
-      isAppended = False
-      #if(removeFromStackCount != 0):
-        #removeFromStackCount -= 1
-      while(self.state[move[0]][move[1]] in ('O', 'X')):
-        move = targetStack.pop()
-      if(self.state[move[0]][move[1]] == '#'):
-        self.fog_of_war[move[0]][move[1]] = 'X'
-        self.state[move[0]][move[1]] = 'X'
-        hitMarkers.append(move)
-        #for i in range(removeFromStackCount):
-          #targetStack.pop()
-        if(move[2] == "up" and move[0] - 1 >= 0 and self.fog_of_war[move[0] - 1][move[1]] == "~"):
-          #if(self.fog_of_war[move[0] + 1][move[1]] == '~' and move[0] + 1 <=9):
-            #targetStack.append((move[0] + 1, move[1], "down"))
-          targetStack.append((move[0] - 1, move[1], "up"))
-          isAppended = True
-        elif(move[2] == "down" and move[0] + 1 <= 9 and self.fog_of_war[move[0] + 1][move[1]] == "~"):
-          #if(self.fog_of_war[move[0] - 1][move[1]] == '~' and move[0] - 1 >= 0):
-            #targetStack.append((move[0] - 1, move[1], "up"))
-          targetStack.append((move[0] + 1, move[1], "down"))
-          isAppended = True
-        elif(move[2] == "left" and move[1] - 1 >= 0 and self.fog_of_war[move[0]][move[1] - 1] == "~"):
-          #if(self.fog_of_war[move[0]][move[1] + 1] == '~' and move[1] + 1 <= 9):
-            #targetStack.append((move[0], move[1] + 1, "right"))
-          targetStack.append((move[0], move[1] - 1, "left"))
-          isAppended = True
-        elif(move[2] == "right" and move[1] + 1 <= 9 and self.fog_of_war[move[0]][move[1] + 1] == "~"): #right
-          #if(self.fog_of_war[move[0]][move[1] - 1] == '~' and move[1] - 1 >= 0):
-            #targetStack.append((move[0], move[1] - 1, "left"))
-          targetStack.append((move[0], move[1] + 1, "right"))
-          isAppended = True
-        clearHitMarkers = False
-        destroyMode = True
-        #loop gets rid of choices added by set up target mode during clear hit marker stage since we don't need to consider the other options we haven't popped yet
-
-        return True
-      #is ~
-      self.fog_of_war[move[0]][move[1]] = 'O'
-      self.state[move[0]][move[1]] = 'O'
-      return False
-
-    else: #this is the search pattern. Hits tiles in a checkerboard style
-      #print("search")
-      if probableHuman:
-        decision = self.get_max_probability()
-        if self.state[decision[0]][decision[1]] == '#':
-          self.fog_of_war[decision[0]][decision[1]] = 'X'
-          self.state[decision[0]][decision[1]] = 'X'
-          hitMarkers.append((decision[0], decision[1], "start"))
-          targetMode = True
-          self.set_up_target_mode(decision[0], decision[1])
-          return True
-        if self.state[decision[0]][decision[1]] == '~':
-          self.fog_of_war[decision[0]][decision[1]] = 'O'
-          self.state[decision[0]][decision[1]] = 'O'
-          return False   
-      else:
-        while(True):
-          if self.state[rowNum][colNum] not in ('X', 'O'):
-            if self.state[rowNum][colNum] == '#':
-              self.fog_of_war[rowNum][colNum] = 'X'
-              self.state[rowNum][colNum] = 'X'
-              targetMode = True
-              hitMarkers.append((rowNum, colNum, "start"))
-              self.set_up_target_mode(rowNum, colNum)
-              return True
-            if self.state[rowNum][colNum] == '~':
-              self.fog_of_war[rowNum][colNum] = 'O'
-              self.state[rowNum][colNum] = 'O'
-              self.next_tile()
-              return False
-        
-          self.next_tile()
-
-      if self.target_mode and self.hit_stack:
-          move = self.hit_stack.pop()
-      else:
-          self.target_mode = False
-          while True:
-              move = (random.randint(0, GRID_SIZE - 1), random.randint(0, GRID_SIZE - 1))
-              if self.state[move[0]][move[1]] not in ('X', 'O'):
-                  break
-
-      row, col = move
-
-      if self.state[row][col] == '#':
-          self.fog_of_war[row][col] = 'X'
-          self.state[row][col] = 'X'
-          self.target_mode = True
-
-          if row > 0 and self.state[row - 1][col] not in ('X', 'O'):
-              self.hit_stack.append((row - 1, col))
-          if row < GRID_SIZE - 1 and self.state[row + 1][col] not in ('X', 'O'):
-              self.hit_stack.append((row + 1, col))
-          if col > 0 and self.state[row][col - 1] not in ('X', 'O'):
-              self.hit_stack.append((row, col - 1))
-          if col < GRID_SIZE - 1 and self.state[row][col + 1] not in ('X', 'O'):
-              self.hit_stack.append((row, col + 1))
-
-          return True
-      else:
-          self.fog_of_war[row][col] = 'O'
-          self.state[row][col] = 'O'
-          return False
+  def human_sim_move(self, probable: bool = False) -> bool:
+    return self.human_sim.move(probable)
   # Chooses a move based on Monte Carlo Simulation
   #  returns a boolean, True for ship hit or False for ship not hit
   def AI_mcts_move(self) -> bool:
     return self.mcts.ai_mcts_move()
-  # Chooses a move based on neural network strategy
+  # Chooses a move based on Monte Carlo Tree Search (UCT)
+  #  returns a boolean, True for ship hit or False for ship not hit
+  def AI_uct_move(self) -> bool:
+    return self.mcts.ai_uct_move()
+  # Chooses a move based on neural network strategy (a batch of one, see neural_network_moves)
   #  returns a boolean, True for ship hit or False for ship not hit
   def neural_network_move(self) -> bool:
-    """
-    IDs for input:
-      0: unexplored (0th layer for 3D one-hot representation)
-      1: hit and destroyed OR miss (1st layer for 3D one-hot representation)
-      2: hit but not destroyed (2nd layer for 3D one-hot representation)
-      3: ship simulated
-      4: ship simulated on top of undestroyed ship
-    Rules:
-      - Input board with 0's, 1's, 2's
-      - Can make a move on 0
-      - Ideally should target locations near existing 2's
-      - The generated data 
-    """
-    if self.network == None:
-      self.train_neural_network()
-    
-    network = self.network
-
-    # input state
-    transformed_state = self.transform_data()
-    test_tensor = np.zeros((10, 10, 3))
-    for row in range(GRID_SIZE):
-      for col in range(GRID_SIZE):
-        if transformed_state[row][col] == 0:
-          test_tensor[row][col][0] = 1
-        if transformed_state[row][col] == 1:
-          test_tensor[row][col][1] = 1
-        if transformed_state[row][col] == 2:
-          test_tensor[row][col][2] = 1
-    if self.searching: test_value = self.get_probability_grid()
-    else: test_value = self.get_heatmap(nreps=H_NREPS, current_state=self.transform_data())    
-
-    # Normalize test value element magnitudes
-    test_value /= np.max(test_value)
-
-    test_data = np.expand_dims(test_tensor, axis=0)
-    test_label = np.expand_dims(test_value, axis=0)
-
-    loss, accuracy = network.evaluate(test_data, test_label, verbose=0)
-    nn_probability_array = np.squeeze(network.predict(test_data, verbose=0))
-
-    for row in range(GRID_SIZE):
-      for col in range(GRID_SIZE):
-        if test_value[row][col] == 0: 
-          nn_probability_array[row][col] = 0
-
-    nn_probability_array /= np.max(nn_probability_array) 
-    max_index = np.argmax(nn_probability_array)
-    max_row, max_col = np.unravel_index(max_index, nn_probability_array.shape)
-    comparisons = False
-    if comparisons:
-      corresponding_in_pgrid = test_value[max_row][max_col]
-      flattened_array = np.array(test_value).flatten()
-      sorted_array = np.sort(flattened_array)[::-1]
-      for i in range(len(sorted_array)):
-        if sorted_array[i] == corresponding_in_pgrid:
-          print("Next move:")
-          print(f"Max Location: ({max_row}, {max_col})")
-          print(f"That is the {i} best move.")
-          break
-
-    stats = False
-    if stats:
-      print(f"Loss: {loss}")
-      print(f"Root mean squared error: {accuracy}")
-      print(nn_probability_array)
-      print(f"Max Location: ({max_row}, {max_col})")
-
-    if self.state[max_row][max_col] == '#':        
-      self.fog_of_war[max_row][max_col] = 'X'
-      self.state[max_row][max_col] = 'X'
-      return True
-    if self.state[max_row][max_col] == '~':
-      self.fog_of_war[max_row][max_col] = 'O'
-      self.state[max_row][max_col] = 'O'
-      return False
+    return neural_network_moves([self])[0]
   # Chooses a move based on heatmap strategy
   #  returns a boolean, True for ship hit or False for ship not hit
   def heatmap_move(self) -> bool:
+    move = self.choose_heatmap_move()
+    if move is None: return None
+    with PROFILER.phase("apply"): return self.apply_heatmap_move(*move)
+  # Cell with the highest probability grid or heatmap value, None if that cell was already struck
+  def choose_heatmap_move(self):
     # prob. grid has 0-1 values, get_heatmap has absolute values
-    if self.searching: heatmap = np.array(self.get_probability_grid())
-    else: heatmap = np.array(self.get_heatmap(nreps=H_NREPS, current_state=self.transform_data()))
+    if self.searching:
+      with PROFILER.phase("score"): heatmap = np.array(self.get_probability_grid())
+    else:
+      with PROFILER.phase("encode"): current_state = self.transform_data()
+      heatmap = np.array(self.get_heatmap(nreps=H_NREPS, current_state=current_state))
     
 
-    max_index = np.argmax(heatmap)
-    max_row, max_col = np.unravel_index(max_index, heatmap.shape)
+    with PROFILER.phase("select"):
+      max_index = np.argmax(heatmap)
+      max_row, max_col = np.unravel_index(max_index, heatmap.shape)
 
-    if self.state[max_row][max_col] == '#':        
-      self.fog_of_war[max_row][max_col] = 'X'
-      self.state[max_row][max_col] = 'X'
+    if self.board.is_shot(max_row, max_col): return None
+    return int(max_row), int(max_col)
+  def apply_heatmap_move(self, row: int, col: int) -> bool:
+    if self.fire(row, col):
       self.searching = False
       return True
-    if self.state[max_row][max_col] == '~':
-      self.fog_of_war[max_row][max_col] = 'O'
-      self.state[max_row][max_col] = 'O'
-      return False
-
+    return False
+
+  """STRATEGY STEPS"""
+  # Every AI move is made of two steps, so that the caller can make the move itself (see Engine):
+  #  choose_AI_move picks the cell to strike, or None if the strategy does not strike this turn
+  #  apply_AI_move strikes that cell and updates the strategy with the result
+  # gen_AI_move does both steps in one go
+  def choose_AI_move(self, style_choice: int):
+    with PROFILER.phase("choose", STYLE_NAMES[style_choice]):
+      if style_choice == 1: return self.choose_random_move()
+      if style_choice == 2: return self.human_sim.choose(probable=False)
+      if style_choice == 3: return self.mcts.choose_move()
+      if style_choice == 4: return choose_neural_network_moves([self])[0]
+      if style_choice == 5: return self.choose_heatmap_move()
+      if style_choice == 6: return self.human_sim.choose(probable=True)
+      if style_choice == 7: return self.mcts.uct_search(UCT_ROLLOUTS, None if UCT_TIME is None else time.time() + UCT_TIME)[:2]
+  #  returns a boolean, True for ship hit or False for ship not hit
+  def apply_AI_move(self, style_choice: int, row: int, col: int) -> bool:
+    with PROFILER.phase("apply", STYLE_NAMES[style_choice]):
+      if style_choice in (2, 6): return self.human_sim.apply(self.fire(row, col))
+      if style_choice == 3: return self.mcts.apply_move(row, col)
+      if style_choice == 5: return self.apply_heatmap_move(row, col)
+      return self.fire(row, col)
+  # Mark ship_name as sunk by a hit on (row, col) when the ship's cells are not known (see Engine)
+  #  the ship goes on the placement through (row, col) whose other cells are unsunk hits and that leaves every other
+  #  unsunk hit on a ship still afloat, cells (the ship's [row, col] cells) picks it when more than one does
+  #  raises ValueError, without changing anything, if no placement or more than one is left
+  def mark_sunk(self, ship_name: str, row: int, col: int, cells=None) -> None:
+    if ship_name not in self.ships_remaining or ship_name in self.ship_masks:
+      raise ValueError(f"{ship_name} is not a ship that is still afloat")
+    table = get_placement_table(SHIPS_SIZES[ship_name])
+    allowed = (self.board.hits & ~self.board.sunk) | Bitboard.cell(row, col)
+    fits = [i for i in table.through[row * GRID_SIZE + col] if table.bits[i] & allowed == table.bits[i]]
+    # The other unsunk hits have to stay on ships still afloat
+    others = [get_placement_table(SHIPS_SIZES[name]) for name in self.ships_remaining if name != ship_name and name not in self.ship_masks]
+    def explains(i: int) -> bool:
+      blocked = self.board.misses | self.board.sunk | table.bits[i]
+      rest = self.board.hits & ~self.board.sunk & ~table.bits[i]
+      while rest:
+        n = (rest & -rest).bit_length() - 1
+        if not any(other.bits[j] & blocked == 0 for other in others for j in other.through[n]): return False
+        rest &= rest - 1
+      return True
+    fits = [i for i in fits if explains(i)]
+    if cells is not None:
+      fits = [i for i in fits if table.bits[i] == Bitboard.cells(cells)]
+      if len(fits) == 0: raise ValueError(f"The {ship_name} can not be on {cells}, its cells must be unsunk hits in a line through {INT_TO_STR[row]}{col}")
+    if len(fits) == 0: raise ValueError(f"No {ship_name} fits the unsunk hits through {INT_TO_STR[row]}{col}")
+    if len(fits) > 1: raise ValueError(f"More than one {ship_name} fits the hits through {INT_TO_STR[row]}{col}, give its cells")
+    self.ships_dict[ship_name] = [[int(n) // GRID_SIZE, int(n) % GRID_SIZE] for n in table.cells[fits[0]]]
+    self.board.ships |= table.bits[fits[0]]
+    self.index_ship(ship_name, table.bits[fits[0]])
+
+
+  """ANYTIME MOVES"""
+  # Best move of a strategy (gen_AI_move style_choice) found within deadline_ms milliseconds, without making it
+  #  strategies that sample keep refining their estimate (more heatmap boards, more rollouts) until the deadline,
+  #  but always finish at least one step. The NN needs a trained model (get_network), training is not time-limited.
+  #  returns (row, col, samples), samples being the number of simulated boards or rollouts reached
+  def best_move(self, style_choice: int, deadline_ms: float) -> tuple[int, int, int]:
+    deadline = time.time() + deadline_ms / 1000
+    if style_choice == 1: return self.random_best_move()
+    if style_choice == 2: return self.human_sim.best_move(probable=False)
+    if style_choice == 3: return self.mcts.best_move(deadline)
+    if style_choice == 4: return self.neural_network_best_move(deadline)
+    if style_choice == 5: return self.heatmap_best_move(deadline)
+    if style_choice == 6: return self.human_sim.best_move(probable=True)
+    if style_choice == 7: return self.mcts.uct_search(float("inf"), deadline)
+  def random_best_move(self) -> tuple[int, int, int]:
+    unshot = np.flatnonzero(~Bitboard.array(self.board.shot()))
+    row, col = divmod(int(random.choice(unshot)), GRID_SIZE)
+    return row, col, 0
+  # Probability grid while searching, otherwise a heatmap of HEATMAP_BATCH boards at a time until the deadline
+  #  (or the exact heatmap if HEATMAP_MODE is "exact" and the board allows it)
+  #  returns (grid, samples), samples is the number of simulated boards (layouts counted for the exact heatmap)
+  def refine_heatmap(self, deadline: float):
+    current_state = self.transform_data()
+    if self.searching: return self.get_probability_grid(), 0
+    if HEATMAP_MODE == "exact":
+      try:
+        heatmap, num_layouts = count_ship_layouts(current_state, self.ships_remaining)
+        if num_layouts != 0: return heatmap, num_layouts
+      except LayoutLimitReached:
+        pass
+    heatmap = np.zeros((GRID_SIZE, GRID_SIZE))
+    samples = 0
+    while samples == 0 or time.time() < deadline:
+      occupied, num_overlaps = simulate_ship_placements(current_state, self.ships_remaining, HEATMAP_BATCH)
+      heatmap += ((num_overlaps + 1).astype(float) @ occupied).reshape(GRID_SIZE, GRID_SIZE)
+      samples += HEATMAP_BATCH
+    heatmap[np.array(current_state) != 0] = 0
+    return heatmap, samples
+  def heatmap_best_move(self, deadline: float) -> tuple[int, int, int]:
+    heatmap, samples = self.refine_heatmap(deadline)
+    row, col = np.unravel_index(np.argmax(heatmap), heatmap.shape)
+    return int(row), int(col), samples
+  def neural_network_best_move(self, deadline: float) -> tuple[int, int, int]:
+    if self.network is None: self.network = get_network()
+    test_value, samples = self.refine_heatmap(deadline)
+    test_data = encode_boards(*(masks[None] for masks in self.board.masks()))
+    nn_probability_array = np.asarray(self.network.predict_on_batch(test_data)).reshape(GRID_SIZE, GRID_SIZE)
+    nn_probability_array = np.where(np.asarray(test_value) > 0, nn_probability_array, 0)
+    row, col = np.unravel_index(np.argmax(nn_probability_array), nn_probability_array.shape)
+    return int(row), int(col), samples
 
   """MOVE HELPERS"""
   # Generates all possible positions of all remaining ships and hits position with highest of existence
   #  returns a the grid location with highest probability of a ship being there
   # only works when in search mode
   def get_max_probability(self) -> tuple[int, int]:
-    # Probabilities of each position start as all 0
-    probability_array = np.zeros((10, 10))
-
-    # Loop through every remaining ship name
-    for ship_name in self.ships_remaining:
-      # Get the current ship size
-      current_ship_size = SHIPS_SIZES[ship_name]
-      # Record right swing position and down swing position from current grid point
-      # For each grid location in the grid
-      for row in range(GRID_SIZE):
-        for col in range(GRID_SIZE):
-          # If a right swing is possible check the right swing orientation placement feasibility
-          if col <= GRID_SIZE-current_ship_size:
-            # If all of the grid locations in the current possible position are unchecked, add to probability grid
-            if all(self.fog_of_war[row][col+n] == '~' for n in range(current_ship_size)):
-              for i in range(current_ship_size):
-                probability_array[row][col+i] = probability_array[row][col+i] + 1
-          # If a down swing is possible check the down swing orientation placement feasibility
-          if row <= GRID_SIZE-current_ship_size:
-          # If all of the grid locations in the current possible position are unchecked, add to probability grid
-            if all(self.fog_of_war[row+n][col] == '~' for n in range(current_ship_size)):
-              for i in range(current_ship_size):
-                probability_array[row+i][col] = probability_array[row+i][col] + 1
-    
+    probability_array = self.get_placement_counts()
+
     max_index = np.argmax(probability_array)
     max_row, max_col = np.unravel_index(max_index, probability_array.shape)
 
     return (max_row, max_col)
   def get_probability_grid(self):
-    # Probabilities of each position start as all 0
-    probability_array = np.zeros((10, 10))
-
-    # Loop through every remaining ship name
-    for ship_name in self.ships_remaining:
-      # Get the current ship size
-      current_ship_size = SHIPS_SIZES[ship_name]
-      # Record right swing position and down swing position from current grid point
-      # For each grid location in the grid
-      for row in range(GRID_SIZE):
-        for col in range(GRID_SIZE):
-          # If a right swing is possible check the right swing orientation placement feasibility
-          if col <= GRID_SIZE-current_ship_size:
-            # If all of the grid locations in the current possible position are unchecked, add to probability grid
-            if all(self.fog_of_war[row][col+n] == '~' for n in range(current_ship_size)):
-              for i in range(current_ship_size):
-                probability_array[row][col+i] = probability_array[row][col+i] + 1
-          # If a down swing is possible check the down swing orientation placement feasibility
-          if row <= GRID_SIZE-current_ship_size:
-          # If all of the grid locations in the current possible position are unchecked, add to probability grid
-            if all(self.fog_of_war[row+n][col] == '~' for n in range(current_ship_size)):
-              for i in range(current_ship_size):
-                probability_array[row+i][col] = probability_array[row+i][col] + 1
-    
+    probability_array = self.get_placement_counts()
+
     max_value = np.max(probability_array)
     probability_array /= max_value
 
     return probability_array
+  # Counts, for each grid location, the placements of every remaining ship that cover it
+  #  only placements where all of the grid locations are unchecked are counted (kept up to date by placements)
+  def get_placement_counts(self):
+    return self.placements.total(self.ships_remaining).reshape(GRID_SIZE, GRID_SIZE)
   # Human sim helpers
-  def next_tile(self) -> None:
-    global colNum
-    global rowNum
-
-    colNum += 2
-    if colNum > 9:
-      rowNum += 1
-      if rowNum % 2 == 0:
-        colNum = 0
-      else:
-        colNum = 1
-  def next_tile_r(self) -> None:
-    global colNum
-    global rowNum
-
-    colNum -= 2
-    if colNum < 0:
-      rowNum -= 1
-      if rowNum % 2 == 1:
-        colNum = 9
-      else:
-        colNum = 8
-  def set_up_target_mode(self, rowNum, colNum) -> int:
-    global targetStack
-    count = 0
-    # above tile
-    if (rowNum - 1 >= 0 and self.state[rowNum - 1][colNum] not in ('X', 'O')):
-      targetStack.append((rowNum - 1, colNum, "up"))
-      count += 1
-    # below tile
-    if (rowNum + 1 <= 9 and self.state[rowNum + 1][colNum] not in ('X', 'O')):
-      targetStack.append((rowNum + 1, colNum, "down"))
-      count += 1
-    # left tile
-    if (colNum - 1 >= 0 and self.state[rowNum][colNum - 1] not in ('X', 'O')):
-      targetStack.append((rowNum, colNum - 1, "left"))
-      count += 1
-    # right tile
-    if (colNum + 1 <= 9 and self.state[rowNum][colNum + 1] not in ('X', 'O')):
-      targetStack.append((rowNum, colNum + 1, "right"))
-      count += 1
-    return count # count is only for knowing how many choices to remove during clear hit marker stage
-  def check_hit_markers(self):
-    global hitMarkers
-    #marker = hitMarkers.pop()
-    i = 1
-    while(i <= len(hitMarkers)):
-      marker = hitMarkers[len(hitMarkers) - i]
-      if(marker[2] != "start"):
-        result = self.set_up_target_mode(marker[0], marker[1])
-        if(result != 0):
-          break
-      else:
-        break
-      i += 1
   # Monte Carlo Sim helpers
   def update_probabilities_after_hit(self, row: int, col: int) -> None:
-    if row > 0 and self.state[row - 1][col] not in ('X', 'O'):
+    if row > 0 and not self.board.is_shot(row - 1, col):
       self.probability_grid[row - 1][col] += 10
-    if row < GRID_SIZE - 1 and self.state[row + 1][col] not in ('X', 'O'):
+    if row < GRID_SIZE - 1 and not self.board.is_shot(row + 1, col):
       self.probability_grid[row + 1][col] += 10
-    if col > 0 and self.state[row][col - 1] not in ('X', 'O'):
+    if col > 0 and not self.board.is_shot(row, col - 1):
       self.probability_grid[row][col - 1] += 10
-    if col < GRID_SIZE - 1 and self.state[row][col + 1] not in ('X', 'O'):
+    if col < GRID_SIZE - 1 and not self.board.is_shot(row, col + 1):
       self.probability_grid[row][col + 1] += 10
   def is_in_bounds(self, row: int, col: int) -> bool:
     return 0 <= row < GRID_SIZE and 0 <= col < GRID_SIZE
@@ -956,190 +1805,479 @@ class BoardState:
     3: ship simulated
     4: ship simulated on top of undestroyed ship
     """
-    # Append extra copies of a simulated board based on number of overlaps with undestroyed ships (more informative sims)
-    heatmap_list = []
-    for _ in range(nreps):
-      test_grid = copy.deepcopy(current_state)
-      num_overlaps = 0
-      new_grid = False
-      # Simulate ship placements on board
-      for ship in self.ships_remaining:
-        # Until the ship is properly placed
-        attempts = 0
-        while True:
-          if attempts >= 500: 
-            new_grid = True
-            break
-          attempts += 1
-          # Get a coordinate value not already used
-          while True:
-            random_row = random.randint(0, GRID_SIZE - 1)
-            random_col = random.randint(0, GRID_SIZE - 1)
-            if test_grid[random_row][random_col] in (0, 2):
-              anchor_row, anchor_col = random_row, random_col
-              break
-          # Get allowed swing points
-          valid_swing_points = []
-          swing_down_allowed = swing_right_allowed = swing_up_allowed = swing_left_allowed = False
-
-          right_swing_point = anchor_col+(SHIPS_SIZES[ship]-1)
-          down_swing_point = anchor_row+(SHIPS_SIZES[ship]-1)
-          left_swing_point = anchor_col-(SHIPS_SIZES[ship]-1)
-          up_swing_point = anchor_row-(SHIPS_SIZES[ship]-1)
-
-          if (down_swing_point <= 9): swing_down_allowed = all(test_grid[n][anchor_col] in (0, 2) for n in range(anchor_row+1, down_swing_point+1))
-          if (right_swing_point <= 9): swing_right_allowed = all(test_grid[anchor_row][n] in (0, 2) for n in range(anchor_col+1, right_swing_point+1))
-          if (up_swing_point >= 0): swing_up_allowed = all(test_grid[n][anchor_col] in (0, 2) for n in range(up_swing_point, anchor_row))
-          if (left_swing_point >= 0): swing_left_allowed = all(test_grid[anchor_row][n] in (0, 2) for n in range(left_swing_point, anchor_col))
-
-          if (swing_down_allowed): valid_swing_points.append(INT_TO_STR[down_swing_point] + str(anchor_col))
-          if (swing_right_allowed): valid_swing_points.append(INT_TO_STR[anchor_row] + str(right_swing_point))
-          if (swing_up_allowed): valid_swing_points.append(INT_TO_STR[up_swing_point] + str(anchor_col))
-          if (swing_left_allowed): valid_swing_points.append(INT_TO_STR[anchor_row] + str(left_swing_point))
-
-          # If there are no possible swing points from the chosen anchor, then reset anchor
-          if len(valid_swing_points) == 0: continue
-          # Place the anchor point on the board
-          if test_grid[anchor_row][anchor_col] == 0: 
-            test_grid[anchor_row][anchor_col] = 3
-          elif test_grid[anchor_row][anchor_col] == 2: 
-            test_grid[anchor_row][anchor_col] = 4
-            num_overlaps += 1
-          # Set secondary point (orientations that are in bounds and do not overlap other ships)
-          swing_point = valid_swing_points[random.randint(0, len(valid_swing_points) - 1)]
-          swing_row, swing_col = (STR_TO_INT[swing_point[0]], int(swing_point[1]))
-          # Place ship onto board
-          a_x, a_y = anchor_row, anchor_col
-          s_x, s_y = swing_row, swing_col
-          # Horizontal orientation
-          if a_y == s_y: 
-            for x in range(min(a_x, s_x), max(a_x, s_x)+1): 
-              if test_grid[x][a_y] == 0: 
-                test_grid[x][a_y] = 3
-              elif test_grid[x][a_y] == 2: 
-                test_grid[x][a_y] = 4
-                num_overlaps += 1
-          # Vertical orientation
-          if a_x == s_x:
-            for y in range(min(a_y, s_y), max(a_y, s_y)+1): 
-              if test_grid[a_x][y] == 0: 
-                test_grid[a_x][y] = 3
-              elif test_grid[a_x][y] == 0: 
-                test_grid[a_x][y] = 4
-                num_overlaps += 1
-
-          break
-        if new_grid: break
-      
-      for _ in range(num_overlaps+1):
-        heatmap_list.append(test_grid)
-    
-    heatmap_tensor = np.array(heatmap_list)
-
-    heatmap = np.zeros((10, 10))
-    for sim in heatmap_tensor:
-      for row in range(GRID_SIZE):
-        for col in range(GRID_SIZE):
-          if sim[row][col] == 3:
-            heatmap[row][col] += 1
+    # Early positions have a heatmap of BOOK_NREPS sims in the opening book, repeated ones are in HEATMAP_CACHE
+    heatmap = opening_book_lookup(current_state, self.ships_remaining)
+    if heatmap is not None: return heatmap.astype(float)
+    return HEATMAP_CACHE.get(current_state, self.ships_remaining, nreps, lambda: self.compute_heatmap(nreps, current_state))
+  # get_heatmap without the opening book and the cache
+  def compute_heatmap(self, nreps, current_state):
+    # The exact heatmap needs no sims, but falls back to sampling on boards too open to enumerate
+    if HEATMAP_MODE == "exact":
+      with PROFILER.phase("exact"): heatmap = self.get_exact_heatmap(current_state)
+      if heatmap is not None: return heatmap
+    # Simulated boards are weighted by 1 + number of overlaps with undestroyed ships (more informative sims)
+    with PROFILER.phase("sample"): occupied, num_overlaps = simulate_ship_placements(current_state, self.ships_remaining, nreps)
+    PROFILER.count("sims", nreps)
+    # Only ships simulated on unexplored cells (3) count towards the heatmap
+    with PROFILER.phase("score"):
+      unexplored = np.array(current_state).reshape(-1) == 0
+      heatmap = ((num_overlaps + 1).astype(float) @ occupied * unexplored).reshape(GRID_SIZE, GRID_SIZE)
 
     return heatmap
+  # Heatmap counting every layout of the remaining ships that fits current_state (see count_ship_layouts)
+  #  returns None if there are too many layouts to enumerate or none at all
+  def get_exact_heatmap(self, current_state):
+    try:
+      heatmap, num_layouts = count_ship_layouts(current_state, self.ships_remaining)
+    except LayoutLimitReached:
+      return None
+    if num_layouts == 0: return None
+    return heatmap
+  # Grid the neural network is checked against for the current board, the probability grid or heatmap scaled to a max of 1
+  #  it is 0 on every cell the NN should not choose
+  def get_nn_label(self):
+    """
+    IDs for input:
+      0: unexplored (0th layer for 3D one-hot representation)
+      1: hit and destroyed OR miss (1st layer for 3D one-hot representation)
+      2: hit but not destroyed (2nd layer for 3D one-hot representation)
+      3: ship simulated
+      4: ship simulated on top of undestroyed ship
+    Rules:
+      - Input board with 0's, 1's, 2's
+      - Can make a move on 0
+      - Ideally should target locations near existing 2's
+      - The generated data 
+    """
+    transformed_state = self.transform_data()
+    if self.searching: test_value = self.get_probability_grid()
+    else: test_value = self.get_heatmap(nreps=H_NREPS, current_state=transformed_state)
+
+    # Normalize test value element magnitudes
+    test_value /= np.max(test_value)
+    return test_value
   # Modify fog of war input
   # 0: unexplored
   # 1: hit and destroyed OR miss
   # 2: hit but not destroyed
   def transform_data(self):
-    current_state = copy.deepcopy(self.fog_of_war)
-    self.searching = True
-    for row in range(GRID_SIZE):
-      for col in range(GRID_SIZE):
-        if current_state[row][col] == 'X' and any([row, col] in _ for _ in self.locations_destroyed):
-          current_state[row][col] = 1
-        elif current_state[row][col] == 'O':
-          current_state[row][col] = 1
-        elif current_state[row][col] == 'X' and not any([row, col] in _ for _ in self.locations_destroyed):
-          current_state[row][col] = 2
-          self.searching = False
-        else:
-          current_state[row][col] = 0
-    return current_state
-  def train_neural_network(self):
-    # [(transformed state, heatmap), ...]
-    with open('NeuralNetworkData', 'rb') as file:
-      pairs = pickle.load(file)
-  
-    input_tensor_list = []
-    heatmap_list = []
-    for pair in pairs:
-      (input_tensor, heatmap) = pair
-      input_tensor_list.append(input_tensor)
-      heatmap_list.append(heatmap)
-
-    # 80:20 split
-    training_data = np.array(input_tensor_list[:int(len(input_tensor_list) * 0.8)])
-    training_labels = np.array(heatmap_list[:int(len(heatmap_list) * 0.8)])
-    validation_data = np.array(input_tensor_list[int(len(input_tensor_list) * 0.8):])
-    validation_labels = np.array(heatmap_list[int(len(heatmap_list) * 0.8):])
-
-    # Define the model
-    network = Sequential([
-      Input(shape=(10, 10, 3)),
-      Conv2D(25, (5, 5), activation='relu', padding="same", kernel_initializer=HeNormal(), kernel_regularizer=l2(0.01)),
-      Flatten(),
-      Dense(100, activation='softmax'),
-      Reshape((10, 10, 1))
-    ])
-    
-    # Compile the model
-    network.compile(optimizer='adam', loss='binary_crossentropy', metrics=['mean_squared_error'])
-    history = network.fit(training_data, training_labels, epochs=EPOCHS, validation_data=(validation_data, validation_labels))
-
-    # Plot history
-    plot_MSE = False
-    if plot_MSE:
-      plt.plot(history.history['mean_squared_error'], label='Training MSE')
-      plt.plot(history.history['val_mean_squared_error'], label='Validation MSE')
-      plt.xlabel('Epoch')
-      plt.ylabel('MSE')
-      plt.title('Training and Validation MSE Across Epochs')
-      plt.legend()
-      plt.show()
-  
-    self.network = network
+    # Searching until there is a hit that is not part of a destroyed ship
+    self.searching = self.board.hits & ~self.board.sunk == 0
+    return board_ids(*self.board.masks()).reshape(GRID_SIZE, GRID_SIZE).tolist()
 
   # General AI move
   #  returns a boolean, True for ship hit or False for ship not hit
   def gen_AI_move(self, style_choice: int) -> bool:
-    if style_choice == 1: return self.random_move()
-    if style_choice == 2: return self.human_sim_move()
-    if style_choice == 3: return self.AI_mcts_move()
-    if style_choice == 4: return self.neural_network_move()
-    if style_choice == 5: return self.heatmap_move()
-
-# Generate a random board for the NN to train on
-#  return (transformed_board, heatmap)
-def generate_random_boards_with_heatmaps():
-  global probableHuman
-  hold_global = probableHuman
-  probableHuman = True
-  num_moves_random = random.randint(0, 80)
+    with PROFILER.phase("move", STYLE_NAMES[style_choice]):
+      if style_choice == 1: return self.random_move()
+      if style_choice == 2: return self.human_sim_move()
+      if style_choice == 3: return self.AI_mcts_move()
+      if style_choice == 4: return self.neural_network_move()
+      if style_choice == 5: return self.heatmap_move()
+      if style_choice == 6: return self.human_sim_move(probable=True)
+      if style_choice == 7: return self.AI_uct_move()
+
+# Name of the saved model for the current training data and NN settings
+#  a sha256 of the name, size and modification time of every data shard file, EPOCHS and NN_CONFIG, so any change
+#  to them trains a new model. Shards are never changed once written (see write_data_shard), so their contents are
+#  not read and the key takes the same time however large the data grows.
+def network_key() -> str:
+  digest = hashlib.sha256()
+  for shard in list_data_shards():
+    for path in (shard + ".inputs.npy", shard + ".labels.npy"):
+      stat = os.stat(path)
+      digest.update(f"{os.path.basename(path)} {stat.st_size} {stat.st_mtime_ns}\n".encode())
+  digest.update(json.dumps({"epochs": EPOCHS, **NN_CONFIG}, sort_keys=True).encode())
+  return digest.hexdigest()[:16] + GAME_CONFIG.suffix
+# Train a new network on the data shards, streamed from disk so the data never has to fit in memory
+#  returns the trained Sequential model
+def train_neural_network():
+  # TensorFlow is only imported once a network is needed, so other strategies (and benchmark workers) start quickly
+  import tensorflow as tf # type: ignore
+  from tensorflow.keras.models import Sequential # type: ignore
+  from tensorflow.keras.layers import Conv2D, Flatten, Dense, Reshape, Input # type: ignore
+  from tensorflow.keras.initializers import HeNormal # type: ignore
+  from tensorflow.keras.regularizers import l2 # type: ignore
+
+  # 80:20 split of every shard
+  signature = (tf.TensorSpec(shape=(None, GRID_SIZE, GRID_SIZE, 3), dtype=tf.float32),
+               tf.TensorSpec(shape=(None, GRID_SIZE, GRID_SIZE), dtype=tf.float32))
+  training_data = tf.data.Dataset.from_generator(lambda: stream_data_batches(0, 0.8), output_signature=signature).prefetch(2)
+  validation_data = tf.data.Dataset.from_generator(lambda: stream_data_batches(0.8, 1), output_signature=signature).prefetch(2)
+
+  # Define the model
+  network = Sequential([
+    Input(shape=(GRID_SIZE, GRID_SIZE, 3)),
+    Conv2D(NN_CONFIG["conv_filters"], (NN_CONFIG["conv_kernel"], NN_CONFIG["conv_kernel"]), activation='relu', padding="same",
+           kernel_initializer=HeNormal(), kernel_regularizer=l2(NN_CONFIG["l2"])),
+    Flatten(),
+    Dense(GRID_SIZE * GRID_SIZE, activation='softmax'),
+    Reshape((GRID_SIZE, GRID_SIZE, 1))
+  ])
+  
+  # Compile the model
+  network.compile(optimizer=NN_CONFIG["optimizer"], loss=NN_CONFIG["loss"], metrics=['mean_squared_error'])
+  history = network.fit(training_data, epochs=EPOCHS, validation_data=validation_data)
+
+  # Plot history
+  plot_MSE = False
+  if plot_MSE:
+    plt.plot(history.history['mean_squared_error'], label='Training MSE')
+    plt.plot(history.history['val_mean_squared_error'], label='Validation MSE')
+    plt.xlabel('Epoch')
+    plt.ylabel('MSE')
+    plt.title('Training and Validation MSE Across Epochs')
+    plt.legend()
+    plt.show()
 
+  return network
+# Trained network for the current training data and NN settings, shared by every board in this process
+#  loaded from MODEL_DIR if it was trained before, otherwise trained and saved there
+NETWORKS = {}
+def get_network():
+  key = network_key()
+  if key not in NETWORKS:
+    path = os.path.join(MODEL_DIR, f"network-{key}.keras")
+    if os.path.exists(path):
+      from tensorflow.keras.models import load_model # type: ignore
+      NETWORKS[key] = load_model(path)
+    else:
+      network = train_neural_network()
+      os.makedirs(MODEL_DIR, exist_ok=True)
+      # Save under a temporary name first so other processes never load a partly written model
+      temp_path = os.path.join(MODEL_DIR, f"network-{key}.{os.getpid()}.tmp.keras")
+      network.save(temp_path)
+      os.replace(temp_path, path)
+      NETWORKS[key] = network
+  return NETWORKS[key]
+# Chooses one move per board with a single call of the neural network for the whole batch
+#  boards share the first network found (get_network if none of the boards have one)
+#  returns a list of booleans, True for ship hit or False for ship not hit on each board
+def neural_network_moves(boards) -> list[bool]:
+  moves = choose_neural_network_moves(boards)
+  with PROFILER.phase("apply"): return [board.fire(*move) if move is not None else None for board, move in zip(boards, moves)]
+# Cells chosen by neural_network_moves, None for a board whose chosen cell was already struck
+def choose_neural_network_moves(boards) -> list:
+  network = next((board.network for board in boards if board.network is not None), None)
+  if network is None: network = get_network()
+  for board in boards: board.network = network
+
+  with PROFILER.phase("encode"): test_data = encode_boards(*(np.stack(masks) for masks in zip(*(board.board.masks() for board in boards))))
+  with PROFILER.phase("label"): test_values = np.stack([board.get_nn_label() for board in boards])
+
+  # (B, GRID_SIZE, GRID_SIZE, 1) predictions, cells the probability grid or heatmap rule out can not be chosen
+  with PROFILER.phase("predict"):
+    nn_probability_array = np.asarray(network.predict_on_batch(test_data)).reshape(len(boards), GRID_SIZE * GRID_SIZE)
+  with PROFILER.phase("select"):
+    nn_probability_array = np.where(test_values.reshape(len(boards), -1) > 0, nn_probability_array, 0)
+    max_rows, max_cols = np.unravel_index(np.argmax(nn_probability_array, axis=1), (GRID_SIZE, GRID_SIZE))
+
+  return [(int(max_row), int(max_col)) if not board.board.is_shot(max_row, max_col) else None
+          for board, max_row, max_col in zip(boards, max_rows, max_cols)]
+# Plays every board to the end with the neural network, stepping all unfinished games together
+#  latencies gets the seconds of every move if it is given, each board's share of the batched step
+#  returns the number of moves it took the AI to win on each board
+def play_nn_games(boards, latencies=None) -> list[int]:
+  move_counts = [0] * len(boards)
+  playing = list(range(len(boards)))
+  while playing:
+    start = time.perf_counter()
+    with PROFILER.phase("move", STYLE_NAMES[4]): neural_network_moves([boards[i] for i in playing])
+    if latencies is not None: latencies += [(time.perf_counter() - start) / len(playing)] * len(playing)
+    for i in playing:
+      move_counts[i] += 1
+      boards[i].check_ship_sunk()
+    playing = [i for i in playing if len(boards[i].ships_remaining) != 0]
+  return move_counts
+
+# Headless game engine: the hit/miss advisor from the README
+#  The engine never sees the opponent's ships and does no input or output. suggest returns the cell its strategy
+#  (a gen_AI_move style_choice) would strike, the caller strikes a cell and reports the result with apply.
+class Engine:
+  def __init__(self, style_choice: int, network=None):
+    self.style_choice = style_choice
+    # Everything the engine knows: struck cells, hits and the ships reported sunk
+    self.board = BoardState(network=network)
+    self.suggestion = None
+  # Cell the AI suggests striking next as (row, col), None if the strategy passes this turn
+  def suggest(self):
+    self.suggestion = self.board.choose_AI_move(self.style_choice)
+    return self.suggestion
+  # Suggestion within deadline_ms milliseconds (see BoardState.best_move), returns (row, col, samples)
+  #  apply feeds the result of striking it to the strategy like a suggest cell. The simulated human chooses
+  #  without simulating anything, and its move has to be chosen for it to learn the result, so it uses suggest.
+  def suggest_within(self, deadline_ms: float) -> tuple[int, int, int]:
+    if self.style_choice in (2, 6):
+      move = self.suggest()
+      return (None, None, 0) if move is None else (*move, 0)
+    row, col, samples = self.board.best_move(self.style_choice, deadline_ms)
+    self.suggestion = None if row is None else (row, col)
+    return row, col, samples
+  # Record the result of striking (row, col): "hit", "miss" or "sunk: <ship name>" for the ship this strike sank
+  #  the strategy learns from the result when the cell is its last suggestion, other cells are only marked on the board
+  #  ship_cells are the [row, col] cells of the sunk ship, needed when more than one placement fits (see mark_sunk)
+  def apply(self, row: int, col: int, result: str, ship_cells=None) -> None:
+    row, col = int(row), int(col)
+    if not (0 <= row < GRID_SIZE and 0 <= col < GRID_SIZE): raise ValueError(f"({row}, {col}) is not on the board")
+    result = result.strip().lower()
+    if result not in ("hit", "miss") and not result.startswith("sunk:"):
+      raise ValueError(f"Unknown result {result!r}, expected 'hit', 'miss' or 'sunk: <ship name>'")
+    if self.board.board.is_shot(row, col): raise ValueError(f"{INT_TO_STR[row]}{col} was already struck")
+    # The board answers the strike the way the caller reported it
+    #  mark_sunk comes first as it raises without changing anything for a ship that can not be sunk there
+    if result.startswith("sunk:"): self.board.mark_sunk(result[len("sunk:"):].strip(), row, col, ship_cells)
+    if result != "miss": self.board.board.ships |= Bitboard.cell(row, col)
+    if (row, col) == self.suggestion: self.board.apply_AI_move(self.style_choice, row, col)
+    else: self.board.fire(row, col)
+    self.suggestion = None
+    self.board.check_ship_sunk()
+  # True once every ship has been reported sunk
+  def is_finished(self) -> bool:
+    return len(self.board.ships_remaining) == 0
+
+# Vector environment: games stepped in lockstep, held as stacked arrays (games x GRID_SIZE*GRID_SIZE cells)
+#  ship_ids holds the SHIPS_NAMES index of the ship on every cell (-1 for water), shot / hits / sunk are the
+#  boolean masks of Bitboard and ids their board_ids, kept up to date by step. cells_afloat counts the cells of every ship
+#  not hit yet and moves the shots of every game.
+#  placements holds the VectorPlacementCounts of the placements that avoid every shot cell, open_placements those of the
+#  placements that avoid misses and sunk ships (they can cross unsunk hits), both built on first use and updated by step.
+#  layouts are place_fleet layouts (see random_fleet_layouts), a game is done once all its ships are sunk.
+class VectorEnv:
+  def __init__(self, layouts):
+    layouts = np.asarray(layouts)
+    self.num_games = len(layouts)
+    num_cells = GRID_SIZE * GRID_SIZE
+    games = np.arange(self.num_games)
+    self.ship_ids = np.full((self.num_games, num_cells), -1, dtype=np.int8)
+    for ship, ship_name in enumerate(SHIPS_NAMES):
+      self.ship_ids[games[:, None], get_placement_table(SHIPS_SIZES[ship_name]).cell_array[layouts[:, ship]]] = ship
+    self.shot = np.zeros((self.num_games, num_cells), dtype=bool)
+    self.hits = np.zeros((self.num_games, num_cells), dtype=bool)
+    self.sunk = np.zeros((self.num_games, num_cells), dtype=bool)
+    self.ids = np.zeros((self.num_games, num_cells), dtype=np.int8)
+    self.cells_afloat = np.tile(np.array([SHIPS_SIZES[ship_name] for ship_name in SHIPS_NAMES], dtype=np.int16), (self.num_games, 1))
+    self.ships_afloat = np.full(self.num_games, len(SHIPS_NAMES))
+    self.moves = np.zeros(self.num_games, dtype=np.int64)
+    self.done = np.zeros(self.num_games, dtype=bool)
+    self._placements = None
+    self._open_placements = None
+  @property
+  def placements(self):
+    if self._placements is None: self._placements = VectorPlacementCounts(self.shot, self.ships_afloat_by_size(slice(None)))
+    return self._placements
+  @property
+  def open_placements(self):
+    if self._open_placements is None:
+      self._open_placements = VectorPlacementCounts((self.shot & ~self.hits) | self.sunk, self.ships_afloat_by_size(slice(None)))
+    return self._open_placements
+  # Strike one cell (row * GRID_SIZE + col) in every game that is not done, actions of done games are ignored
+  #  returns (observations, hit, sunk, done): the new observations, whether each shot hit,
+  #  the SHIPS_NAMES index of the ship it sank (-1 for none) and whether each game is done
+  def step(self, actions):
+    actions = np.asarray(actions)
+    games = np.flatnonzero(~self.done)
+    cells = actions[games]
+    if np.any((cells < 0) | (cells >= GRID_SIZE * GRID_SIZE)): raise ValueError("Every game that is not done needs a cell on the board")
+    # Index into the flattened (games * cells) arrays, one lookup per game is much faster than a 2D fancy index
+    flat_cells = games * (GRID_SIZE * GRID_SIZE) + cells
+    shot = self.shot.reshape(-1)
+    if shot[flat_cells].any(): raise ValueError("A cell was struck twice")
+    shot[flat_cells] = True
+    self.moves[games] += 1
+    ships = self.ship_ids.reshape(-1)[flat_cells]
+    is_hit = ships >= 0
+    self.ids.reshape(-1)[flat_cells] = np.where(is_hit, 2, 1)
+    if self._placements is not None: self._placements.block(games, cells)
+    missed_games, missed_cells = games[~is_hit], cells[~is_hit]
+    games, flat_cells, ships = games[is_hit], flat_cells[is_hit], ships[is_hit]
+    hit = np.zeros(self.num_games, dtype=bool)
+    hit[games] = True
+    self.hits.reshape(-1)[flat_cells] = True
+    flat_ships = games * len(SHIPS_NAMES) + ships
+    cells_afloat = self.cells_afloat.reshape(-1)
+    cells_afloat[flat_ships] -= 1
+    # Ships whose last cell was just hit
+    sinking = cells_afloat[flat_ships] == 0
+    games, ships = games[sinking], ships[sinking]
+    sunk = np.full(self.num_games, -1, dtype=np.int8)
+    sunk[games] = ships
+    sunk_cells = self.ship_ids[games] == ships[:, None]
+    self.sunk[games] |= sunk_cells
+    self.ids[games] = np.where(sunk_cells, 1, self.ids[games])
+    sunk_sizes = np.array([SHIPS_SIZES[ship_name] for ship_name in SHIPS_NAMES])[ships]
+    if self._placements is not None: self._placements.sink(games, sunk_sizes)
+    if self._open_placements is not None:
+      self._open_placements.sink(games, sunk_sizes)
+      self._open_placements.block(missed_games, missed_cells)
+      sunk_rows, sunk_cols = np.nonzero(sunk_cells)
+      self._open_placements.block(games[sunk_rows], sunk_cols, repeated_games=True)
+    self.ships_afloat[games] -= 1
+    self.done[games] = self.ships_afloat[games] == 0
+    return self.observations(), hit, sunk, self.done.copy()
+  # board_ids of every game (games x GRID_SIZE*GRID_SIZE), what a strategy sees of the boards
+  def observations(self):
+    return self.ids.copy()
+  # Number of ships of each size still afloat in the given games, {ship size: (games,) counts}
+  def ships_afloat_by_size(self, games) -> dict:
+    afloat = self.cells_afloat[games] > 0
+    counts = {}
+    for ship, ship_name in enumerate(SHIPS_NAMES):
+      counts[SHIPS_SIZES[ship_name]] = counts.get(SHIPS_SIZES[ship_name], 0) + afloat[:, ship]
+    return counts
+
+# PlacementCounts of every game of a VectorEnv, given the (games x GRID_SIZE*GRID_SIZE) cells placements may not cover
+#  and the ships afloat in each game ({ship size: (games,) counts}, see VectorEnv.ships_afloat_by_size)
+#  feasible[ship_size] has a column per placement plus a last one that is always False (the through_array padding),
+#  total holds the number of feasible placements of every ship afloat covering each cell of each game, what
+#  PlacementCounts.total gives for one board. block and sink keep it up to date.
+class VectorPlacementCounts:
+  def __init__(self, blocked, ships_afloat: dict):
+    self.tables = {ship_size: get_placement_table(ship_size) for ship_size in set(SHIPS_SIZES.values())}
+    self.feasible = {}
+    self.afloat = {ship_size: np.array(ships_afloat[ship_size], dtype=np.int64) for ship_size in self.tables}
+    total = np.zeros((len(blocked), GRID_SIZE * GRID_SIZE), dtype=np.float32)
+    for ship_size, table in self.tables.items():
+      self.feasible[ship_size] = np.zeros((len(blocked), len(table.bits) + 1), dtype=bool)
+      self.feasible[ship_size][:, :-1] = blocked.astype(np.float32) @ table.cover.T == 0
+      total += self.afloat[ship_size][:, None] * (self.feasible[ship_size][:, :-1].astype(np.float32) @ table.cover)
+    self.total = total.astype(np.int64)
+  # Remove the placements through newly blocked cells, cells[i] being blocked in games[i]
+  #  only the few placements through each cell are touched, like PlacementCounts.shoot.
+  #  repeated_games must be True if a game can be given more than one cell, a placement through two of them is removed once
+  def block(self, games, cells, repeated_games: bool = False) -> None:
+    removed_cells = []
+    for ship_size, table in self.tables.items():
+      feasible = self.feasible[ship_size]
+      placements = table.through_array[cells]
+      rows, cols = np.nonzero(feasible[games[:, None], placements])
+      removed_games, removed = games[rows], placements[rows, cols]
+      if repeated_games: removed_games, removed = np.divmod(np.unique(removed_games * feasible.shape[1] + removed), feasible.shape[1])
+      feasible[removed_games, removed] = False
+      # Each cell of a removed placement is covered once less by every ship of its size afloat
+      flat_cells = (removed_games[:, None] * (GRID_SIZE * GRID_SIZE) + table.cell_array[removed]).reshape(-1)
+      removed_cells.append(np.repeat(flat_cells, np.repeat(self.afloat[ship_size][removed_games], ship_size)))
+    total = self.total.reshape(-1)
+    total -= np.bincount(np.concatenate(removed_cells), minlength=len(total))
+  # A ship of ship_sizes[i] was sunk in games[i], its placements no longer count towards the total
+  def sink(self, games, ship_sizes) -> None:
+    for ship_size, table in self.tables.items():
+      sinking = games[ship_sizes == ship_size]
+      if len(sinking) == 0: continue
+      self.total[sinking] -= (self.feasible[ship_size][sinking, :-1].astype(np.float32) @ table.cover).astype(np.int64)
+      self.afloat[ship_size][sinking] -= 1
+
+# Batched strategies: one move for every game of a VectorEnv at once
+#  return the (games,) cells to strike, -1 for games that are done
+# choose_random_move for every game: random cells, drawn again for the games whose cell was already struck
+def vector_random_moves(env: VectorEnv):
+  moves = np.full(env.num_games, -1)
+  games = np.flatnonzero(~env.done)
+  shot = env.shot.reshape(-1)
+  while len(games) > 0:
+    cells = np.random.randint(0, GRID_SIZE * GRID_SIZE, len(games))
+    free = ~shot[games * (GRID_SIZE * GRID_SIZE) + cells]
+    moves[games[free]] = cells[free]
+    games = games[~free]
+  return moves
+# Highest scoring unshot cell of each game in games, the first one in row order on ties
+#  scores holds the (games x GRID_SIZE*GRID_SIZE) scores of those games
+def vector_best_moves(env: VectorEnv, games, scores):
+  moves = np.full(env.num_games, -1)
+  scores[env.shot[games]] = -1
+  moves[games] = np.argmax(scores, axis=1)
+  return moves
+# get_max_probability for every game: the cell covered by the most placements of the ships afloat that avoid every shot cell
+#  Once no placement fits (unsunk hits block them all) get_max_probability would return a struck cell,
+#  this takes the first unshot cell instead
+def vector_probability_moves(env: VectorEnv):
+  games = np.flatnonzero(~env.done)
+  return vector_best_moves(env, games, env.placements.total[games])
+# shot_scores heatmap argmax for every game: placements avoid misses and sunk ships, placements through unsunk hits
+#  count 1 + TARGET_WEIGHT per hit they cover, so the games with a hit finish off its ship
+def vector_heatmap_moves(env: VectorEnv):
+  games = np.flatnonzero(~env.done)
+  scores = env.open_placements.total[games].astype(np.float32)
+  # Only the games with unsunk hits have placements weighted above 1
+  targeting = games[(env.hits[games] & ~env.sunk[games]).any(axis=1)]
+  if len(targeting) > 0:
+    pending = (env.hits[targeting] & ~env.sunk[targeting]).astype(np.float32)
+    rows = np.searchsorted(games, targeting)
+    for ship_size, num_afloat in env.ships_afloat_by_size(targeting).items():
+      table = get_placement_table(ship_size)
+      weights = env.open_placements.feasible[ship_size][targeting, :-1] * (pending @ table.cover.T)
+      scores[rows] += (TARGET_WEIGHT * num_afloat)[:, None] * (weights @ table.cover)
+  return vector_best_moves(env, games, scores)
+# Batched strategies by name
+VECTOR_STRATEGIES = {"random": vector_random_moves, "probability": vector_probability_moves, "heatmap": vector_heatmap_moves}
+# Play ngames games of a batched strategy in one VectorEnv, seeded layouts and moves if seed is given
+#  returns the number of moves of each game
+def play_vector_games(strategy: str, ngames: int, seed=None):
+  if seed is not None: np.random.seed(seed)
+  env = VectorEnv(random_fleet_layouts(ngames, seed))
+  choose_moves = VECTOR_STRATEGIES[strategy]
+  while not env.done.all(): env.step(choose_moves(env))
+  return env.moves
+# One-board counterparts of the batched strategies, the cell (row * GRID_SIZE + col) each would strike on a BoardState
+#  random has none, its moves depend on the order of the random draws
+def scalar_probability_move(board) -> int:
+  return int(np.argmax(np.where(Bitboard.array(board.board.shot()), -1, board.get_placement_counts().reshape(-1))))
+def scalar_heatmap_move(board) -> int:
+  return int(np.argmax(shot_scores(board.board, board.ships_remaining)))
+SCALAR_STRATEGIES = {"probability": scalar_probability_move, "heatmap": scalar_heatmap_move}
+# Share of the layouts on which a batched strategy strikes the same cells as its one-board counterpart, move for move
+def vector_parity(strategy: str, layouts) -> float:
+  env = VectorEnv(layouts)
+  choose_moves = VECTOR_STRATEGIES[strategy]
+  history = []
+  while not env.done.all():
+    history.append(choose_moves(env))
+    env.step(history[-1])
+  history = np.stack(history, axis=1)
+  matches = 0
+  for layout, game_moves, num_moves in zip(layouts, history, env.moves):
+    board = BoardState()
+    board.place_fleet(layout)
+    scalar_moves = []
+    while board.ships_remaining:
+      scalar_moves.append(SCALAR_STRATEGIES[strategy](board))
+      board.fire(*divmod(scalar_moves[-1], GRID_SIZE))
+      board.check_ship_sunk()
+    matches += game_moves[:num_moves].tolist() == scalar_moves
+  return matches / len(layouts)
+# Benchmark a batched strategy, returns the same summary as run_benchmark
+def run_vector_benchmark(strategy: str, ngames: int = VECTOR_GAMES, seed=BENCHMARK_SEED) -> dict:
+  start = time.perf_counter()
+  moves = play_vector_games(strategy, ngames, seed)
+  wall_time = time.perf_counter() - start
+  return {"name": f"{strategy} (vector)", "games": ngames, "wall_time": wall_time, "games_per_sec": ngames / wall_time,
+          "mean": float(np.mean(moves)), "median": float(np.median(moves)), "p95": float(np.percentile(moves, 95)), "errors": []}
+
+# Generate random boards for the NN to train on, each after its own random number of random moves
+#  boards where every ship was sunk are skipped, so fewer than nsamples pairs can be returned
+#  return [(input_tensor, heatmap), ...], input_tensor being the encode_boards representation
+def generate_random_boards_with_heatmaps(nsamples: int = NN_NREPS):
   board = BoardState()
-  data = []
-  for _ in range(NN_NREPS):
-    for ship in SHIPS_NAMES:
-      board.randomly_place_ship(ship)
+  masks = []
+  heatmaps = []
+  for layout in random_fleet_layouts(nsamples):
+    board.reset()
+    board.place_fleet(layout)
+    # Up to every cell of the board, stopping once every ship cell is hit as the game is over
+    #  (an unhit ship cell is also an unshot cell, so random_move always has one to choose)
+    num_moves_random = random.randint(0, GRID_SIZE * GRID_SIZE)
     for _ in range(num_moves_random):
+      if board.board.ships & ~board.board.hits == 0: break
       board.random_move()
+    for _ in SHIPS_NAMES: board.check_ship_sunk()
     if len(board.ships_remaining) == 0: continue
     transformed_layout = board.transform_data()
-    if board.searching: data.append((transformed_layout, board.get_probability_grid()))
-    else: data.append((transformed_layout, board.get_heatmap(nreps=H_NREPS, current_state=transformed_layout)))
-    board.reset()
-  
-  probableHuman = hold_global
+    masks.append(board.board.masks())
+    if board.searching: heatmaps.append(board.get_probability_grid())
+    else: heatmaps.append(board.get_heatmap(nreps=H_NREPS, current_state=transformed_layout))
 
-  return data
+  if len(masks) == 0: return []
+  input_tensors = encode_boards(*(np.stack(board_masks) for board_masks in zip(*masks)))
+  return list(zip(input_tensors, heatmaps))
 
 # Player chooses if they want to play a game or test the AI
 def choose_play_or_test() -> int:
@@ -1150,6 +2288,7 @@ def choose_play_or_test() -> int:
     if choice == '1': return 1
     if choice == '2': return 2
 # Player chooses which AI they want to play against / test
+#  returns the menu number, a key of AI_TYPES
 def choose_AI_type(choice: int) -> int:
     # Player choose form of AI move style
     if choice == 1:
@@ -1159,22 +2298,10 @@ def choose_AI_type(choice: int) -> int:
     while True:
         clear_console()
         print(f"Select the type of AI you want to {input_string}.")
-        print("Random moves: 1")
-        print("Simulated player (even strategy): 2")
-        print("Simulated player (probabilistic strategy): 3")
-        print("Monte Carlo Simulation: 4")
-        print("Neural Network: 5")
-        print("Heatmap: 6")
+        for number, (description, _) in AI_TYPES.items():
+            print(f"{description}: {number}")
         choice = input()
-        if choice == '1': return 1
-        if choice == '2': return 2
-        if choice == '3':
-            global probableHuman
-            probableHuman = True
-            return 2
-        if choice == '4': return 3
-        if choice == '5': return 4
-        if choice == '6': return 5
+        if choice.isdigit() and int(choice) in AI_TYPES: return int(choice)
     
 # Print the user interface for each turn
 def print_UI(player_grid, AI_grid, player_move_result: str, AI_move_result: str) -> None:
@@ -1201,54 +2328,594 @@ def print_end_message(player_grid, AI_grid, player_win: bool, move_count: int) -
   print("Enemy grid")
   AI_grid.print_grid(fog_of_war=True)
 
-# Generate NN data
-def generate_data():
-  # [(input_tensor, heatmap), (input_tensor, heatmap), ...]  
-  new_pairs = generate_random_boards_with_heatmaps()
-  random_board_list = []
-  heatmap_list = []
-
-  for pair in new_pairs:
-    random_board, heatmap = pair
-    random_board_list.append(random_board)
-    heatmap_list.append(heatmap)
-
-  # Transform random boards to a list of one-hot 3D representations
-  # layer 0: unexplored
-  # layer 1: hit and destroyed OR miss
-  # layer 2: hit but not destroyed
-  input_tensor_list = []
-  for random_board in random_board_list:
-    input_tensor = np.zeros((GRID_SIZE, GRID_SIZE, 3))
-    for row in range(GRID_SIZE):
-      for col in range(GRID_SIZE):
-        if random_board[row][col] == 0:
-          input_tensor[row][col][0] = 1
-        if random_board[row][col] == 1:
-          input_tensor[row][col][1] = 1
-        if random_board[row][col] == 2:
-          input_tensor[row][col][2] = 1
-        input_tensor_list.append(input_tensor)
-
-  # Create a new list for the new pairs
-  new_pairs_transformed = [(input_tensor_list[i], heatmap_list[i]) for i in range(len(new_pairs))]
-
-  # Append to current list and write to file
+# Directory of the NN data shards of the current game config
+def data_dir() -> str:
+  return NN_DATA_DIR + GAME_CONFIG.suffix
+# Turn the old single-file NeuralNetworkData pickle (standard game only) into the first shard if there are no shards yet
+def import_legacy_data() -> None:
+  if GAME_CONFIG.suffix or os.path.isdir(data_dir()) or not os.path.exists('NeuralNetworkData'): return
   with open('NeuralNetworkData', 'rb') as file:
     pairs = pickle.load(file)
-  for i in range(len(new_pairs_transformed)):
-    pairs.append(new_pairs_transformed[i])
-  with open('NeuralNetworkData', 'wb') as file:
-    pickle.dump(pairs, file)
+  os.makedirs(data_dir())
+  if len(pairs) != 0: write_data_shard([input_tensor for input_tensor, _ in pairs], [heatmap for _, heatmap in pairs])
+# Paths of the NN data shards without the .inputs.npy / .labels.npy endings, oldest first
+def list_data_shards() -> list[str]:
+  import_legacy_data()
+  if not os.path.isdir(data_dir()): return []
+  names = sorted(name[:-len(".labels.npy")] for name in os.listdir(data_dir()) if name.endswith(".labels.npy"))
+  return [os.path.join(data_dir(), name) for name in names]
+# Write (one-hot input tensor, heatmap) pairs as a new shard
+#  inputs are stored as uint8 (GRID_SIZE x GRID_SIZE x 3) and heatmaps as float32 (GRID_SIZE x GRID_SIZE)
+#  returns the shard path
+def write_data_shard(input_tensors, heatmaps) -> str:
+  import_legacy_data()
+  os.makedirs(data_dir(), exist_ok=True)
+  shard = os.path.join(data_dir(), f"shard-{time.time_ns()}-{os.getpid()}")
+  # The labels file is written last and marks the shard as complete for list_data_shards
+  np.save(shard + ".inputs.npy", np.asarray(input_tensors, dtype=np.uint8).reshape(-1, GRID_SIZE, GRID_SIZE, 3))
+  np.save(shard + ".tmp.npy", np.asarray(heatmaps, dtype=np.float32).reshape(-1, GRID_SIZE, GRID_SIZE))
+  os.replace(shard + ".tmp.npy", shard + ".labels.npy")
+  return shard
+# Number of (input tensor, heatmap) pairs in every shard, read from the .npy headers
+def count_data() -> int:
+  return sum(len(np.load(shard + ".labels.npy", mmap_mode='r')) for shard in list_data_shards())
+# Batches of (float32 inputs, heatmaps) from the part [start, stop) of every shard, e.g. (0, 0.8) for the first 80%
+#  Shards are memory mapped and batches come in a new random order on every pass
+def stream_data_batches(start: float, stop: float):
+  batches = []
+  for shard in list_data_shards():
+    size = len(np.load(shard + ".labels.npy", mmap_mode='r'))
+    first, last = int(size * start), int(size * stop)
+    batches += [(shard, i, min(i + TRAIN_BATCH_SIZE, last)) for i in range(first, last, TRAIN_BATCH_SIZE)]
+  arrays = {}
+  for batch in np.random.permutation(len(batches)):
+    shard, i, j = batches[batch]
+    if shard not in arrays:
+      arrays[shard] = (np.load(shard + ".inputs.npy", mmap_mode='r'), np.load(shard + ".labels.npy", mmap_mode='r'))
+    inputs, labels = arrays[shard]
+    yield inputs[i:j].astype(np.float32), np.array(labels[i:j])
+
+# Worker for generate_data: generates nsamples samples of the game config with its own seed and writes them as a new shard
+#  returns the number of pairs written
+def generate_data_chunk(nsamples: int, seed: int, config=None) -> int:
+  if config is not None and config.key != GAME_CONFIG.key: use_game_config(config)
+  random.seed(seed)
+  np.random.seed(seed)
+  # [(input_tensor, heatmap), (input_tensor, heatmap), ...]  
+  new_pairs = generate_random_boards_with_heatmaps(nsamples)
 
-  print(f"{len(pairs)} pairings (tensor input, heatmap) in data.")
+  # Write the new pairs as a new shard, earlier shards are left untouched
+  if len(new_pairs) != 0: write_data_shard([input_tensor for input_tensor, _ in new_pairs], [heatmap for _, heatmap in new_pairs])
+  return len(new_pairs)
+# Generate NN_NREPS new samples of NN data over DATA_WORKERS processes
+#  every task writes its shard as soon as it finishes, progress is printed as tasks come in
+def generate_data():
+  # Import the old pickle before the workers start writing shards
+  list_data_shards()
+  chunks = [min(DATA_CHUNK, NN_NREPS - start) for start in range(0, NN_NREPS, DATA_CHUNK)]
+  base_seed = time.time_ns() % (1 << 32)
+  seeds = [(base_seed + chunk * 1000003) % (1 << 32) for chunk in range(len(chunks))]
+  start = time.time()
+  done = 0
+  written = 0
+  with ProcessPoolExecutor(max_workers=DATA_WORKERS) as executor:
+    futures = {executor.submit(generate_data_chunk, nsamples, seed, GAME_CONFIG): nsamples for nsamples, seed in zip(chunks, seeds)}
+    for future in as_completed(futures):
+      done += futures[future]
+      written += future.result()
+      elapsed = time.time() - start
+      print(f"{done}/{NN_NREPS} samples ({written} kept) in {elapsed:.1f}s, {done / elapsed:.2f} samples/s")
+
+  print(f"{count_data()} pairings (tensor input, heatmap) in data.")
+
+# Opening book: {canonical_position key: heatmap} of the early positions, the heatmap in the key's orientation
+#  Every game starts from the same empty board, so get_heatmap looks the heatmaps of the early positions up here
+#  instead of simulating them again. The book holds get_heatmap's simulation with more sims and nothing else,
+#  so only the players that use get_heatmap (the heatmap player and the NN's labels) see it, and they play as they
+#  would without the book. Loaded once by get_opening_book.
+OPENING_BOOK = None
+# File of the opening book of the current game config
+def opening_book_file() -> str:
+  return OPENING_BOOK_FILE + GAME_CONFIG.suffix
+def get_opening_book() -> dict:
+  global OPENING_BOOK
+  if OPENING_BOOK is None:
+    OPENING_BOOK = {}
+    if os.path.exists(opening_book_file()):
+      with open(opening_book_file(), 'rb') as file:
+        OPENING_BOOK = pickle.load(file)
+  return OPENING_BOOK
+# Book heatmap of a position given by its flattened board_ids and the ships still afloat
+#  returns the heatmap in the board's orientation, or None if the position is not in the book
+def opening_book_lookup(ids, ship_names):
+  book = get_opening_book()
+  if len(book) == 0: return None
+  key, symmetry = canonical_position(ids, ship_names)
+  if key not in book: return None
+  PROFILER.count("book hit")
+  return from_canonical(book[key], symmetry)
+# Build the opening book: the positions the heatmap player reaches from the empty board in up to depth moves that each
+#  hit or miss (a hit that sinks a ship leaves the book, as the sunk ship's cells are not known until the game says so)
+#  The walk strikes the cells the player would (see choose_heatmap_move): the probability grid's best cell while
+#  searching, and after a hit the best cell of the position's heatmap of nreps simulated boards, the one get_heatmap
+#  then returns from the book. Only positions after a hit call get_heatmap, so only they get a heatmap.
+#  The NN's moves depend on the network, so the book covers its positions only where they meet the heatmap player's.
+#  returns the book, see get_opening_book
+def build_opening_book(depth: int = BOOK_DEPTH, nreps: int = BOOK_NREPS) -> dict:
+  book = {}
+  positions = [Bitboard()]
+  for _ in range(depth):
+    next_positions = []
+    for board in positions:
+      if board.hits == 0: cell = int(np.argmax(PlacementCounts(board.misses).total(SHIPS_NAMES)))
+      else:
+        ids = board_ids(*board.masks())
+        key, symmetry = canonical_position(ids, SHIPS_NAMES)
+        if key not in book:
+          ids = ids[SYMMETRIES[symmetry]]
+          occupied, num_overlaps = simulate_ship_placements(ids, SHIPS_NAMES, nreps)
+          heatmap = (num_overlaps + 1).astype(float) @ occupied * (ids == 0)
+          book[key] = heatmap.reshape(GRID_SIZE, GRID_SIZE).astype(np.float32)
+        cell = int(np.argmax(from_canonical(book[key], symmetry)))
+      # Miss and hit on the player's move
+      next_positions.append(Bitboard(hits=board.hits, misses=board.misses | 1 << cell))
+      next_positions.append(Bitboard(hits=board.hits | 1 << cell, misses=board.misses))
+    positions = next_positions
+  return book
+# Build the opening book and save it to opening_book_file, replacing the loaded one
+def generate_opening_book() -> None:
+  global OPENING_BOOK
+  start = time.time()
+  OPENING_BOOK = build_opening_book()
+  # Save under a temporary name first so other processes never load a partly written book
+  temp_path = f"{opening_book_file()}.{os.getpid()}.tmp"
+  with open(temp_path, 'wb') as file:
+    pickle.dump(OPENING_BOOK, file)
+  os.replace(temp_path, opening_book_file())
+  print(f"{len(OPENING_BOOK)} opening book positions in {time.time() - start:.1f}s.")
+
+# Play one game of AI moves on an already set up board, latencies gets the seconds each move took if it is given
+#  returns the number of moves it took the AI to win
+def play_solo_game(board, style_choice: int, latencies=None) -> int:
+  count_AI = 0
+  while True:
+    # Make AI move according to player choice
+    if latencies is None: board.gen_AI_move(style_choice)
+    else:
+      start = time.perf_counter()
+      board.gen_AI_move(style_choice)
+      latencies.append(time.perf_counter() - start)
+    count_AI += 1
+    # Needed to update ships_remaining 
+    board.check_ship_sunk()
+    # Check if the AI has won
+    if len(board.ships_remaining) == 0: return count_AI
+# Start of every task of the game workers (run_benchmark, run_benchmark_suite, run_tournament): seeds this process with seed
+#  config is the GameConfig of the games, workers started without the parent's globals switch to it first
+def start_worker_games(seed: int, config=None) -> None:
+  if config is not None and config.key != GAME_CONFIG.key: use_game_config(config)
+  random.seed(seed)
+  np.random.seed(seed)
+  # Heatmaps cached by earlier tasks of this worker would make the moves depend on which tasks it ran
+  HEATMAP_CACHE.clear()
+# Worker for run_benchmark: plays ngames games of one AI type in this process with its own seed (see start_worker_games)
+#  returns (moves of each game that finished, errors), errors has the seed, number in this task and error of every
+#  game that raised, so one broken game does not stop the whole run
+def play_benchmark_games(ai_type: int, ngames: int, seed: int, config=None):
+  start_worker_games(seed, config)
+  errors = []
+  rep_history = play_layout_games(AI_TYPES[ai_type][1], random_fleet_layouts(ngames), errors=errors)
+  return [moves for moves in rep_history if moves is not None], [{"seed": seed, "game": game, "error": error} for game, error in errors]
+# Play one game on each fleet layout (see place_fleet), latencies gets the seconds of every move if it is given
+#  errors, if it is given, gets (layout number, error) of every game that raises instead of stopping there,
+#  that game's moves are None
+#  returns the number of moves of each game
+def play_layout_games(style_choice: int, layouts, latencies=None, errors=None) -> list:
+  # The NN player is limited by network calls, so its games are played together in one batch
+  if style_choice == 4:
+    boards = [BoardState() for _ in range(len(layouts))]
+    for board, layout in zip(boards, layouts): board.place_fleet(layout)
+    try:
+      return play_nn_games(boards, latencies)
+    except Exception as error:
+      if errors is None: raise
+      # One game that raises stops the whole batch
+      errors += [(game, f"{type(error).__name__}: {error}") for game in range(len(layouts))]
+      return [None] * len(layouts)
+  board = BoardState()
+  rep_history = []
+  for game, layout in enumerate(layouts):
+    # Reset the board with new ship placements
+    board.reset()
+    board.place_fleet(layout)
+    try:
+      rep_history.append(play_solo_game(board, style_choice, latencies))
+    except Exception as error:
+      if errors is None: raise
+      errors.append((game, f"{type(error).__name__}: {error}"))
+      rep_history.append(None)
+  return rep_history
+# Worker for run_benchmark when profiling: play_benchmark_games with PROFILER on (tracing for a Chrome trace)
+#  and under cProfile if cprofile_path is given, whose stats are saved there
+#  returns (play_benchmark_games result, PROFILER.take())
+def profile_benchmark_games(ai_type: int, ngames: int, seed: int, config=None, tracing: bool = False, cprofile_path=None):
+  PROFILER.reset()
+  PROFILER.enable(tracing)
+  profile = cProfile.Profile() if cprofile_path is not None else None
+  if profile is not None: profile.enable()
+  try:
+    chunk_result = play_benchmark_games(ai_type, ngames, seed, config)
+  finally:
+    if profile is not None:
+      profile.disable()
+      profile.dump_stats(cprofile_path)
+    PROFILER.disable()
+  return chunk_result, PROFILER.take()
+# Play ngames games of an AI type (choose_AI_type menu number) spread over worker processes
+#  Games are split into chunks of BENCHMARK_CHUNK (NN_BATCH_GAMES for the NN), each seeded from seed and its chunk number,
+#  so the move counts only depend on the seed and not on the number of workers
+#  profile times the phases of every move (see Profiler) and cprofile runs every chunk under cProfile, both are saved to
+#  PROFILE_DIR as benchmark-<ai_type> files (cProfile stats of all chunks merged) and profile adds the phase stats to the result
+#  returns a dictionary of the move history and timing statistics of the games that finished, and the errors of
+#  the games that raised (see play_benchmark_games)
+def run_benchmark(ai_type: int, ngames: int, workers: int = BENCHMARK_WORKERS, seed: int = BENCHMARK_SEED,
+                  profile: bool = PROFILE, cprofile: bool = CPROFILE) -> dict:
+  chunk_size = NN_BATCH_GAMES if AI_TYPES[ai_type][1] == 4 else BENCHMARK_CHUNK
+  chunks = [min(chunk_size, ngames - start) for start in range(0, ngames, chunk_size)]
+  # No more processes than chunks, work that fits in one chunk (test mode's NREPS = 1) is played in this process
+  workers = min(workers, len(chunks))
+  seeds = [seed * 1000003 + chunk for chunk in range(len(chunks))]
+  args = [[ai_type] * len(chunks), chunks, seeds, [GAME_CONFIG] * len(chunks)]
+  worker = play_benchmark_games
+  if profile or cprofile:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = os.path.join(PROFILE_DIR, f"benchmark-{ai_type}")
+    cprofile_paths = [f"{name}.{chunk}.{os.getpid()}.tmp.prof" if cprofile else None for chunk in range(len(chunks))]
+    args += [[profile and PROFILE_FORMAT == "chrome"] * len(chunks), cprofile_paths]
+    worker = profile_benchmark_games
+  start = time.time()
+  if workers <= 1:
+    chunk_results = list(map(worker, *args))
+  else:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+      chunk_results = list(executor.map(worker, *args))
+  wall_time = time.time() - start
+  profile_stats = None
+  if worker is profile_benchmark_games:
+    profiler = Profiler()
+    for _, data in chunk_results: profiler.merge(data)
+    chunk_results = [chunk_result for chunk_result, _ in chunk_results]
+    if profile:
+      profile_stats = profiler.stats()
+      profiler.save(name + (".trace.json" if PROFILE_FORMAT == "chrome" else ".json"), PROFILE_FORMAT)
+    if cprofile:
+      pstats.Stats(*cprofile_paths).dump_stats(name + ".prof")
+      for path in cprofile_paths: os.remove(path)
+  rep_history = [moves for chunk_history, _ in chunk_results for moves in chunk_history]
+  errors = [error for _, chunk_errors in chunk_results for error in chunk_errors]
+  # Statistics of no games when every game raised
+  if len(rep_history) == 0: rep_history_stats = [float("nan")]
+  else: rep_history_stats = rep_history
+  result = {"ai_type": ai_type,
+          "name": AI_TYPES[ai_type][0],
+          "games": len(rep_history),
+          "workers": workers,
+          "seed": seed,
+          "wall_time": wall_time,
+          "games_per_sec": len(rep_history) / wall_time if wall_time > 0 else float("inf"),
+          "mean": float(np.mean(rep_history_stats)),
+          "median": float(np.median(rep_history_stats)),
+          "p95": float(np.percentile(rep_history_stats, 95)),
+          "rep_history": rep_history,
+          "errors": errors}
+  if profile_stats is not None: result["profile"] = profile_stats
+  return result
+# Print the results of run_benchmark, one line per AI type
+def print_benchmark_report(results: list[dict]) -> None:
+  print(f"{'AI type':<45}{'games':>7}{'wall (s)':>10}{'games/s':>10}{'mean':>8}{'median':>8}{'p95':>8}")
+  for result in results:
+    print(f"{result['name']:<45}{result['games']:>7}{result['wall_time']:>10.2f}{result['games_per_sec']:>10.2f}"
+          f"{result['mean']:>8.2f}{result['median']:>8.1f}{result['p95']:>8.1f}")
+  for result in results: print_game_errors(result["name"], result["errors"])
+# Print the games of an AI type that raised (see play_benchmark_games), one line each
+def print_game_errors(name: str, errors: list[dict]) -> None:
+  if errors: print(f"{name}, games left out as they raised:")
+  for error in errors: print(f"  game {error['game']} of the task seeded {error['seed']}: {error['error']}")
+# Print the phase stats of Profiler.stats, one line per phase of each strategy (slowest first) and one per counter
+def print_profile_report(stats: dict) -> None:
+  print(f"{'strategy':<16}{'phase':<18}{'calls':>10}{'total (s)':>11}{'mean (us)':>11}{'max (us)':>11}")
+  for strategy, strategy_stats in stats.items():
+    for name, phase in sorted(strategy_stats["phases"].items(), key=lambda item: -item[1]["total_s"]):
+      print(f"{strategy:<16}{name:<18}{phase['calls']:>10}{phase['total_s']:>11.3f}{phase['mean_us']:>11.1f}{phase['max_us']:>11.1f}")
+    for name, n in strategy_stats["counters"].items():
+      print(f"{strategy:<16}{name:<18}{n:>10}")
+
+# Benchmark suite: every AI type plays the same fixed corpus of fleet layouts with fixed seeds, so a run only changes
+#  when the code or settings do. Each run is appended to SUITE_RESULTS_FILE and checked against the baseline.
+# Corpus of the current game config: {"version", "config", "placements"}, placements holds (horizontal, top row, left col)
+#  of every ship of every layout (CORPUS_SIZE x ships x 3), which does not depend on the order of the placement tables.
+#  Drawn from CORPUS_VERSION as the seed the first time and read from the corpus file after that.
+def get_benchmark_corpus() -> dict:
+  path = CORPUS_FILE + GAME_CONFIG.suffix
+  if os.path.exists(path):
+    with open(path, 'rb') as file:
+      corpus = pickle.load(file)
+    if corpus["version"] == CORPUS_VERSION and corpus["config"] == GAME_CONFIG.key: return corpus
+  tables = [get_placement_table(SHIPS_SIZES[ship_name]) for ship_name in SHIPS_NAMES]
+  placement_keys = [{index: key for key, index in table.index.items()} for table in tables]
+  layouts = random_fleet_layouts(CORPUS_SIZE, seed=CORPUS_VERSION)
+  placements = np.array([[placement_keys[ship][int(index)] for ship, index in enumerate(layout)] for layout in layouts], dtype=np.int16)
+  corpus = {"version": CORPUS_VERSION, "config": GAME_CONFIG.key, "placements": placements}
+  # Save under a temporary name first so other processes never load a partly written corpus
+  temp_path = f"{path}.{os.getpid()}.tmp"
+  with open(temp_path, 'wb') as file:
+    pickle.dump(corpus, file)
+  os.replace(temp_path, path)
+  return corpus
+# The corpus placements as place_fleet layouts, (CORPUS_SIZE x ships) placement indices
+def corpus_layouts(corpus: dict):
+  tables = [get_placement_table(SHIPS_SIZES[ship_name]) for ship_name in SHIPS_NAMES]
+  return np.array([[table.index[(bool(horizontal), int(row), int(col))] for table, (horizontal, row, col) in zip(tables, layout)]
+                   for layout in corpus["placements"]])
+# Worker for run_benchmark_suite: plays one game of an AI type on each layout with its own seed (see start_worker_games)
+#  returns (moves of each game, seconds of every move)
+def play_suite_games(ai_type: int, layouts, seed: int, config=None):
+  start_worker_games(seed, config)
+  latencies = []
+  rep_history = play_layout_games(AI_TYPES[ai_type][1], layouts, latencies)
+  return rep_history, latencies
+# Git revision of the code, with -dirty if tracked files have changes, or "unknown" outside of a git checkout
+def git_revision() -> str:
+  repo = os.path.dirname(os.path.abspath(__file__))
+  try:
+    revision = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True, text=True, check=True).stdout.strip()
+    changes = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo, capture_output=True, text=True, check=True).stdout
+  except (OSError, subprocess.CalledProcessError):
+    return "unknown"
+  return revision + ("-dirty" if changes.strip() else "")
+# Play every AI type of ai_types on the whole corpus, spread over worker processes like run_benchmark
+#  Chunks are seeded from CORPUS_VERSION and their chunk number, so every run plays exactly the same games.
+#  returns the suite record: git revision, game config, corpus, settings and for each AI type the moves of every game
+#  and the moves to win and move latency distributions
+def run_benchmark_suite(ai_types=SUITE_AI_TYPES, workers: int = BENCHMARK_WORKERS) -> dict:
+  corpus = get_benchmark_corpus()
+  layouts = corpus_layouts(corpus)
+  record = {"revision": git_revision(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {"grid_size": GRID_SIZE, "ships_sizes": SHIPS_SIZES},
+            "corpus": {"version": corpus["version"], "size": len(layouts),
+                       "digest": hashlib.sha256(corpus["placements"].tobytes()).hexdigest()[:16]},
+            "settings": {"H_NREPS": H_NREPS, "HEATMAP_MODE": HEATMAP_MODE, "UCT_ROLLOUTS": UCT_ROLLOUTS, "UCT_TIME": UCT_TIME,
+                         "opening_book": len(get_opening_book()), "workers": workers},
+            "results": {}}
+  for ai_type in ai_types:
+    chunk_size = NN_BATCH_GAMES if AI_TYPES[ai_type][1] == 4 else BENCHMARK_CHUNK
+    chunks = [layouts[start:start + chunk_size] for start in range(0, len(layouts), chunk_size)]
+    seeds = [CORPUS_VERSION * 1000003 + chunk for chunk in range(len(chunks))]
+    args = [[ai_type] * len(chunks), chunks, seeds, [GAME_CONFIG] * len(chunks)]
+    start = time.time()
+    if workers <= 1:
+      chunk_results = list(map(play_suite_games, *args))
+    else:
+      with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunk_results = list(executor.map(play_suite_games, *args))
+    wall_time = time.time() - start
+    rep_history = [moves for chunk_history, _ in chunk_results for moves in chunk_history]
+    latencies_ms = np.array([latency for _, chunk_latencies in chunk_results for latency in chunk_latencies]) * 1000
+    record["results"][str(ai_type)] = {
+      "name": AI_TYPES[ai_type][0],
+      "games": len(rep_history),
+      "wall_time": wall_time,
+      "moves": {"mean": float(np.mean(rep_history)), "median": float(np.median(rep_history)),
+                "p95": float(np.percentile(rep_history, 95)), "std": float(np.std(rep_history))},
+      "latency_ms": {"mean": float(latencies_ms.mean()), "p50": float(np.percentile(latencies_ms, 50)),
+                     "p95": float(np.percentile(latencies_ms, 95)), "p99": float(np.percentile(latencies_ms, 99)),
+                     "max": float(latencies_ms.max())},
+      "rep_history": rep_history}
+  return record
+# Regressions of a suite record against a baseline record, one message per regression
+#  strength: mean moves to win up by more than STRENGTH_TOLERANCE, speed: p50 or p95 latency up by more than
+#  SPEED_TOLERANCE (and SPEED_FLOOR_MS). Records of another game config or corpus are not comparable and give no regressions,
+#  latencies are only compared between runs with the same number of workers (they share the CPU).
+def find_regressions(record: dict, baseline: dict) -> list[str]:
+  if record["config"] != baseline["config"] or record["corpus"] != baseline["corpus"]: return []
+  compare_speed = record["settings"]["workers"] == baseline["settings"]["workers"]
+  regressions = []
+  for ai_type, result in record["results"].items():
+    if ai_type not in baseline["results"]: continue
+    base = baseline["results"][ai_type]
+    moves, base_moves = result["moves"]["mean"], base["moves"]["mean"]
+    if moves > base_moves * (1 + STRENGTH_TOLERANCE):
+      regressions.append(f"{result['name']}: strength, {moves:.2f} moves to win against {base_moves:.2f} "
+                         f"({(moves / base_moves - 1) * 100:+.1f}%)")
+    for percentile in ("p50", "p95") if compare_speed else ():
+      latency, base_latency = result["latency_ms"][percentile], base["latency_ms"][percentile]
+      if latency > base_latency * (1 + SPEED_TOLERANCE) and latency - base_latency > SPEED_FLOOR_MS:
+        regressions.append(f"{result['name']}: speed, {percentile} move latency {latency:.3f} ms against {base_latency:.3f} ms "
+                           f"({(latency / base_latency - 1) * 100:+.1f}%)")
+  return regressions
+# Run the suite, append it to SUITE_RESULTS_FILE and check it against the baseline (saving it as the baseline if
+#  there is none for this game config and corpus yet, or if update_baseline is set)
+#  returns (record, baseline it was checked against or None, regressions)
+def run_suite_and_check(ai_types=SUITE_AI_TYPES, workers: int = BENCHMARK_WORKERS, update_baseline: bool = UPDATE_BASELINE):
+  record = run_benchmark_suite(ai_types, workers)
+  with open(SUITE_RESULTS_FILE, 'a') as file:
+    file.write(json.dumps(record) + "\n")
+  baseline_path = SUITE_BASELINE_FILE + GAME_CONFIG.suffix + ".json"
+  baseline = None
+  if os.path.exists(baseline_path):
+    with open(baseline_path) as file:
+      baseline = json.load(file)
+    if baseline["corpus"] != record["corpus"]: baseline = None
+  regressions = [] if baseline is None else find_regressions(record, baseline)
+  if baseline is None or update_baseline:
+    with open(baseline_path, 'w') as file:
+      json.dump(record, file, indent=1)
+  return record, baseline, regressions
+# Print a suite record next to its baseline, one line per AI type, then its regressions
+def print_suite_report(record: dict, baseline, regressions: list[str]) -> None:
+  print(f"Revision {record['revision']}, {record['config']['grid_size']}x{record['config']['grid_size']} board, "
+        f"corpus v{record['corpus']['version']} ({record['corpus']['size']} layouts)"
+        + (f", baseline {baseline['revision']}" if baseline is not None else ", saved as the baseline"))
+  print(f"{'AI type':<45}{'mean':>8}{'base':>8}{'p50 ms':>10}{'base':>10}{'p95 ms':>10}{'base':>10}")
+  for ai_type, result in record["results"].items():
+    base = baseline["results"].get(ai_type) if baseline is not None else None
+    base_columns = (f"{base['moves']['mean']:>8.2f}", f"{base['latency_ms']['p50']:>10.3f}", f"{base['latency_ms']['p95']:>10.3f}") \
+      if base is not None else (f"{'-':>8}", f"{'-':>10}", f"{'-':>10}")
+    print(f"{result['name']:<45}{result['moves']['mean']:>8.2f}{base_columns[0]}"
+          f"{result['latency_ms']['p50']:>10.3f}{base_columns[1]}{result['latency_ms']['p95']:>10.3f}{base_columns[2]}")
+  if regressions:
+    print("REGRESSIONS:")
+    for regression in regressions: print("  " + regression)
+  elif baseline is not None: print("No regressions.")
+
+# Tournament: every pair of AI types plays mirrored games on shared layouts
+#  Players take turns striking each other's board and whoever sinks the other fleet first wins. A player's moves only
+#  depend on the board it strikes, so a game is decided by both players' moves to win on their target boards (the
+#  first player wins ties). Every AI type therefore plays each layout once by itself and every game of every pair is
+#  read off those solo games. Layouts 2i and 2i+1 make a mirrored pair of games: A strikes 2i and moves first, then
+#  A strikes 2i+1 and B moves first, so both players get the same boards and turn order.
+# Worker for run_tournament: plays one game of an AI type on each layout with its own seed (see start_worker_games)
+#  returns (moves of each game, None for a game that raised, CPU seconds of this process for all of them, errors)
+#  errors has the seed, number in this task and error of every game that raised (see play_benchmark_games)
+def play_tournament_games(ai_type: int, layouts, seed: int, config=None):
+  start_worker_games(seed, config)
+  start = time.process_time()
+  errors = []
+  rep_history = play_layout_games(AI_TYPES[ai_type][1], layouts, errors=errors)
+  return rep_history, time.process_time() - start, [{"seed": seed, "game": game, "error": error} for game, error in errors]
+# 95% Wilson score interval of wins out of games
+def wilson_interval(wins: int, games: int, z: float = 1.96) -> tuple[float, float]:
+  if games == 0: return 0.0, 1.0
+  rate = wins / games
+  center = (rate + z * z / (2 * games)) / (1 + z * z / games)
+  margin = z * np.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / (1 + z * z / games)
+  return float(center - margin), float(center + margin)
+# Elo ratings (mean 1500) of the Bradley-Terry model that best fits wins[i][j] (games player i won against j)
+#  Every pair gets half a win each way, so a player that won every game still has a finite rating.
+def elo_ratings(wins) -> list[float]:
+  wins = np.asarray(wins, dtype=float)
+  played = wins + wins.T
+  wins = wins + 0.5 * (played > 0)
+  games = wins + wins.T
+  strength = np.ones(len(wins))
+  # Minorization-maximization updates of the Bradley-Terry strengths
+  for _ in range(1000):
+    pair_sums = strength[:, None] + strength[None, :]
+    new_strength = wins.sum(axis=1) / np.where(games > 0, games / pair_sums, 0).sum(axis=1)
+    new_strength /= np.exp(np.mean(np.log(new_strength)))
+    if np.allclose(new_strength, strength, rtol=1e-10): break
+    strength = new_strength
+  ratings = 400 * np.log10(strength)
+  return [float(rating) for rating in ratings - ratings.mean() + 1500]
+# Play every pair of ai_types (choose_AI_type menu numbers) against each other over ngames mirrored games each
+#  The solo games are spread over worker processes in chunks seeded from seed, like run_benchmark. A mirrored pair of
+#  games where either player's solo game raised is left out of that matchup.
+#  returns a dictionary of every player (Elo, CPU ms per move, mean moves to win, errors of its games that raised)
+#  and every matchup (win rate and its 95% interval)
+def run_tournament(ai_types=TOURNAMENT_AI_TYPES, ngames: int = TOURNAMENT_GAMES, workers: int = BENCHMARK_WORKERS,
+                   seed: int = TOURNAMENT_SEED) -> dict:
+  num_layouts = ngames + ngames % 2
+  layouts = random_fleet_layouts(num_layouts, seed=seed)
+  tasks = []
+  for ai_type in ai_types:
+    chunk_size = NN_BATCH_GAMES if AI_TYPES[ai_type][1] == 4 else BENCHMARK_CHUNK
+    for chunk, start in enumerate(range(0, num_layouts, chunk_size)):
+      tasks.append((ai_type, layouts[start:start + chunk_size], seed * 1000003 + chunk, GAME_CONFIG))
+  start = time.time()
+  if workers <= 1:
+    task_results = [play_tournament_games(*task) for task in tasks]
+  else:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+      task_results = list(executor.map(play_tournament_games, *zip(*tasks)))
+  wall_time = time.time() - start
+  moves = {ai_type: [] for ai_type in ai_types}
+  cpu_time = {ai_type: 0.0 for ai_type in ai_types}
+  errors = {ai_type: [] for ai_type in ai_types}
+  for (ai_type, *_), (rep_history, cpu_seconds, task_errors) in zip(tasks, task_results):
+    moves[ai_type] += rep_history
+    cpu_time[ai_type] += cpu_seconds
+    errors[ai_type] += task_errors
+  # Games that raised are NaN
+  moves = {ai_type: np.array(rep_history, dtype=float) for ai_type, rep_history in moves.items()}
+  finished = {ai_type: ~np.isnan(rep_history[0::2]) & ~np.isnan(rep_history[1::2]) for ai_type, rep_history in moves.items()}
+
+  wins = np.zeros((len(ai_types), len(ai_types)), dtype=np.int64)
+  matchups = []
+  for i, player in enumerate(ai_types):
+    for j in range(i + 1, len(ai_types)):
+      opponent = ai_types[j]
+      # Moves of both on layouts 2k and 2k+1, whoever moves first wins ties
+      pairs = finished[player] & finished[opponent]
+      player_even, player_odd = moves[player][0::2][pairs], moves[player][1::2][pairs]
+      opponent_even, opponent_odd = moves[opponent][0::2][pairs], moves[opponent][1::2][pairs]
+      player_wins = int(np.sum(player_even <= opponent_odd) + np.sum(player_odd < opponent_even))
+      games = 2 * len(player_even)
+      wins[i][j], wins[j][i] = player_wins, games - player_wins
+      low, high = wilson_interval(player_wins, games)
+      matchups.append({"ai_type": player, "opponent": opponent, "games": games, "wins": player_wins,
+                       "win_rate": player_wins / games if games > 0 else float("nan"), "ci_low": low, "ci_high": high})
+  ratings = elo_ratings(wins)
+  players = {}
+  for i, ai_type in enumerate(ai_types):
+    finished_moves = moves[ai_type][~np.isnan(moves[ai_type])]
+    total_moves = int(finished_moves.sum())
+    players[ai_type] = {"name": AI_TYPES[ai_type][0], "elo": ratings[i], "wins": int(wins[i].sum()),
+                        "games": int((wins[i] + wins[:, i]).sum()),
+                        "mean_moves": float(finished_moves.mean()) if len(finished_moves) > 0 else float("nan"),
+                        "cpu_ms_per_move": cpu_time[ai_type] * 1000 / total_moves if total_moves > 0 else float("nan"),
+                        "errors": errors[ai_type]}
+  return {"games_per_matchup": 2 * (num_layouts // 2), "seed": seed, "workers": workers, "wall_time": wall_time,
+          "players": players, "matchups": matchups}
+# Print the results of run_tournament: the players by Elo, then every matchup's win rate
+def print_tournament_report(tournament: dict) -> None:
+  players = tournament["players"]
+  print(f"{tournament['games_per_matchup']} games per matchup in {tournament['wall_time']:.1f}s")
+  print(f"{'AI type':<45}{'Elo':>8}{'win %':>8}{'moves':>8}{'CPU ms/move':>13}")
+  for player in sorted(players.values(), key=lambda player: -player["elo"]):
+    print(f"{player['name']:<45}{player['elo']:>8.0f}{100 * player['wins'] / max(player['games'], 1):>8.1f}"
+          f"{player['mean_moves']:>8.2f}{player['cpu_ms_per_move']:>13.3f}")
+  print(f"{'AI type':<45}{'opponent':<45}{'win %':>8}{'95% interval':>16}")
+  for matchup in tournament["matchups"]:
+    print(f"{players[matchup['ai_type']]['name']:<45}{players[matchup['opponent']]['name']:<45}{100 * matchup['win_rate']:>8.1f}"
+          f"{100 * matchup['ci_low']:>8.1f}-{100 * matchup['ci_high']:.1f}")
+  for player in players.values(): print_game_errors(player["name"], player["errors"])
 
 def main():
+  use_game_config(GameConfig(PLAY_GRID_SIZE, PLAY_SHIPS_SIZES))
   if GENERATE_DATA: 
     generate_data()
     return 0
 
-  global humanSimSunkResult
+  if BUILD_OPENING_BOOK:
+    generate_opening_book()
+    return 0
+  # Load the opening book before any game (benchmark workers share it)
+  get_opening_book()
+
+  if BENCHMARK_SUITE:
+    print_suite_report(*run_suite_and_check())
+    return 0
+
+  if TOURNAMENT:
+    print_tournament_report(run_tournament())
+    return 0
+
+  if VECTOR_BENCHMARK:
+    print_benchmark_report([run_vector_benchmark(strategy) for strategy in VECTOR_BENCHMARK_STRATEGIES])
+    layouts = random_fleet_layouts(VECTOR_PARITY_GAMES, BENCHMARK_SEED)
+    for strategy in VECTOR_BENCHMARK_STRATEGIES:
+      if strategy in SCALAR_STRATEGIES:
+        print(f"{strategy} (vector) plays like one board at a time on {100 * vector_parity(strategy, layouts):.1f}% of {len(layouts)} layouts")
+    return 0
+
+  if BENCHMARK:
+    results = [run_benchmark(ai_type, BENCHMARK_GAMES) for ai_type in BENCHMARK_AI_TYPES]
+    print_benchmark_report(results)
+    for result in results:
+      if "profile" in result: print_profile_report(result["profile"])
+    return 0
+
   # Check whether the user wants to play a game or test the AI
   play_or_test = choose_play_or_test()
   
@@ -1271,7 +2938,7 @@ def main():
     for ship_name in SHIPS_NAMES: AI_grid.randomly_place_ship(ship_name)
 
     # Player choose form of AI move style
-    style_choice = choose_AI_type(play_or_test)
+    style_choice = AI_TYPES[choose_AI_type(play_or_test)][1]
 
     # These messages will appear at the top of the screen during each turn,
     #  so before the first turn there will be some help messages
@@ -1302,9 +2969,7 @@ def main():
       player_check_ship_hit = player_grid.gen_AI_move(style_choice)
       AI_move_result = "The enemy has hit one of your ships!" if player_check_ship_hit else "The enemy missed."
       # Check if a friendly ship has been sunk from the opponent's previous move
-      result = player_grid.check_ship_sunk()
-      humanSimSunkResult = result
-      player_ship_sunk = result
+      player_ship_sunk = player_grid.check_ship_sunk()
       AI_move_result = "The enemy has sunk your " + player_ship_sunk + "!" if player_ship_sunk != "" else AI_move_result
       count_AI += 1
       # Check if the opponent has won
@@ -1315,33 +2980,16 @@ def main():
   # If the user wants to test the AI
   if play_or_test == 2:
     # Player choose form of AI move style
-    style_choice = choose_AI_type(play_or_test)
+    ai_type = choose_AI_type(play_or_test)
+    style_choice = AI_TYPES[ai_type][1]
 
     nreps = NREPS
-    test_grid = BoardState()
+    # Get all simulation data, spread over BENCHMARK_WORKERS processes
+    #  (seeded from the clock so repeated test runs play new boards)
+    benchmark = run_benchmark(ai_type, nreps, seed=int(time.time()))
     # Will hold number of moves for each rep
-    rep_history = []
-    start  = time.time()
-    # Get all simulation data
-    for i in range(nreps):
-      # Reset the board with new ship placements
-      test_grid.reset()
-      for ship_name in SHIPS_NAMES: test_grid.randomly_place_ship(ship_name)
-      # Reset the number of moves
-      count_AI = 0
-      # Simulate a game
-      while True:
-        # Make AI move according to player choice
-        _ = test_grid.gen_AI_move(style_choice)
-        count_AI += 1
-        # Needed to update ships_remaining 
-        result = test_grid.check_ship_sunk()
-        humanSimSunkResult = result
-        _ = result
-        # Check if the AI has won
-        if len(test_grid.ships_remaining) == 0: 
-          rep_history.append(count_AI)
-          break
+    rep_history = benchmark["rep_history"]
+    nreps = len(rep_history)
     # NN is compute-heavy so its reps are stored
     if style_choice == 4:
       with open('NeuralNetworkMoves', 'rb') as file:
@@ -1364,9 +3012,11 @@ def main():
       nreps = len(rep_history) # because nreps is used in the avg calculation
     # After all testing, show average moves for the AI to win
     clear_console()
-    print(f"Time elapsed: {time.time() - start}")
+    print(f"Time elapsed: {benchmark['wall_time']}")
     print(f"It took the AI {sum(rep_history)/nreps} moves on average to win!")
+    print_game_errors(AI_TYPES[ai_type][0], benchmark["errors"])
     print(f"Number of samples: {nreps}")
+    if "profile" in benchmark: print_profile_report(benchmark["profile"])
 
     # Plot the winning moves in a bar graph 
     plt.hist(rep_history, bins=range(min(rep_history), max(rep_history) + 2), edgecolor='black', align='left')
@@ -0,0 +1,266 @@
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from playgame import AI_TYPES, GRID_SIZE, BoardState, choose_neural_network_moves, get_network, random_fleet_layouts
+
+HOST = "127.0.0.1"
+PORT = 8765
+SERVER_WORKERS = None # Processes for the CPU-heavy strategies (None for one per CPU), every session always uses the same one
+OFFLOADED_STYLES = {3, 5, 7} # gen_AI_move styles whose moves are chosen in the process pool (MCTS, heatmap, UCT)
+NN_BATCH = 64 # Most NN moves of different sessions chosen with one network call
+NN_BATCH_WAIT = 0.005 # Seconds the NN batcher waits for more sessions to join a batch
+LOAD_TEST = False # Start the server and play LOAD_TEST_SESSIONS random-move clients against it over localhost
+LOAD_TEST_SESSIONS = 1000
+LOAD_TEST_AI_TYPE = 2 # choose_AI_type menu number the load test clients play against
+PRELOAD_NETWORK = True # Load the NN when the server starts instead of on the first NN move (load tests never preload)
+
+"""
+Line based JSON protocol, one request and one response per line:
+  {"cmd": "new", "ai_type": 2}                -> {"session": 1}
+  {"cmd": "fire", "session": 1, "row": 0, "col": 4}
+      -> {"result": "hit", "sunk": "", "ai_move": [3, 3], "ai_result": "miss", "ai_sunk": "", "winner": "", "latency": 0.0012}
+  {"cmd": "state", "session": 1}              -> {"player": [...], "enemy": [...]} (own board and fog of war of the AI's board)
+  {"cmd": "stats", "session": 1}              -> {"moves": 30, "p50": 0.001, "p99": 0.004} (all sessions without "session")
+  {"cmd": "close", "session": 1}              -> {"closed": 1}
+Errors are answered with {"error": "..."}.
+"""
+
+# UCT search trees of the sessions played by this worker process, by session id
+#  the trees stay in the worker so only the compact board is sent each move
+WORKER_TREES = {}
+# Choose the AI's next cell on board in a worker process
+#  the board comes back too, as choosing can change the strategy's state (hit stack),
+#  without its placement tables (see PlacementCounts) and search tree, which the worker keeps
+def choose_in_worker(session_id: int, board, style_choice: int):
+  board.mcts.table = WORKER_TREES.pop(session_id, {})
+  move = board.choose_AI_move(style_choice)
+  if board.mcts.table: WORKER_TREES[session_id] = board.mcts.table
+  board.mcts.table = {}
+  return move, board
+# Forget a closed session's search tree
+def close_in_worker(session_id: int) -> None:
+  WORKER_TREES.pop(session_id, None)
+
+# One game: the player's board (which the AI strikes) and the AI's board (which the player strikes)
+class Session:
+  def __init__(self, session_id: int, ai_type: int):
+    self.session_id = session_id
+    self.ai_type = ai_type
+    self.style_choice = AI_TYPES[ai_type][1]
+    self.player_grid = BoardState()
+    self.AI_grid = BoardState()
+    player_layout, AI_layout = random_fleet_layouts(2)
+    self.player_grid.place_fleet(player_layout)
+    self.AI_grid.place_fleet(AI_layout)
+    self.winner = ""
+    self.lock = asyncio.Lock()
+    # Seconds taken by each "fire" request (player move and AI move)
+    self.latencies = []
+
+class GameServer:
+  def __init__(self, workers=SERVER_WORKERS):
+    self.sessions = {}
+    self.session_ids = itertools.count(1)
+    # Workers are not forked from the serving process, a forked worker would hold every open connection's socket
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    # One single process pool per worker, a session's moves all go to the worker holding its search tree
+    context = multiprocessing.get_context(start_method)
+    self.pools = [ProcessPoolExecutor(max_workers=1, mp_context=context) for _ in range(workers or os.cpu_count())]
+    self.nn_queue = asyncio.Queue()
+    self.nn_batcher = None
+    # Connection handler tasks still running, awaited on shutdown so no connection is cut mid request
+    self.clients = set()
+
+  # Cell the AI strikes next on the session's player board, the expensive strategies run off the event loop
+  async def choose_AI_move(self, session: Session):
+    loop = asyncio.get_running_loop()
+    if session.style_choice == 4:
+      if self.nn_batcher is None: self.start_nn_batcher()
+      future = loop.create_future()
+      await self.nn_queue.put((session.player_grid, future))
+      return await future
+    if session.style_choice in OFFLOADED_STYLES:
+      move, session.player_grid = await loop.run_in_executor(self.session_pool(session.session_id), choose_in_worker,
+                                                             session.session_id, session.player_grid, session.style_choice)
+      return move
+    return session.player_grid.choose_AI_move(session.style_choice)
+
+  def start_nn_batcher(self) -> None:
+    self.nn_batcher = asyncio.create_task(self.batch_nn_moves())
+  # Collects the NN moves of different sessions and chooses them with one network call per batch
+  async def batch_nn_moves(self):
+    loop = asyncio.get_running_loop()
+    try:
+      network = await loop.run_in_executor(None, get_network)
+    except Exception as error:
+      # Answer the waiting moves with the error, the next NN move starts a new batcher that tries loading again
+      self.nn_batcher = None
+      while not self.nn_queue.empty():
+        _, future = self.nn_queue.get_nowait()
+        if not future.done(): future.set_exception(error)
+      return
+    while True:
+      requests = [await self.nn_queue.get()]
+      batch_end = loop.time() + NN_BATCH_WAIT
+      while len(requests) < NN_BATCH:
+        try:
+          requests.append(await asyncio.wait_for(self.nn_queue.get(), max(0, batch_end - loop.time())))
+        except asyncio.TimeoutError:
+          break
+      boards = [board for board, _ in requests]
+      for board in boards: board.network = network
+      try:
+        moves = await loop.run_in_executor(None, choose_neural_network_moves, boards)
+      except Exception as error:
+        for _, future in requests:
+          if not future.done(): future.set_exception(error)
+        continue
+      for (_, future), move in zip(requests, moves):
+        if not future.done(): future.set_result(move)
+
+  def session_pool(self, session_id: int) -> ProcessPoolExecutor:
+    return self.pools[session_id % len(self.pools)]
+
+  def get_session(self, request) -> Session:
+    session = self.sessions.get(request.get("session"))
+    if session is None: raise ValueError(f"Unknown session {request.get('session')!r}")
+    return session
+
+  async def handle(self, request: dict) -> dict:
+    cmd = request.get("cmd")
+    if cmd == "new":
+      ai_type = int(request.get("ai_type", 2))
+      if ai_type not in AI_TYPES: raise ValueError(f"Unknown ai_type {ai_type}")
+      session = Session(next(self.session_ids), ai_type)
+      self.sessions[session.session_id] = session
+      return {"session": session.session_id}
+    if cmd == "fire": return await self.fire(self.get_session(request), request)
+    if cmd == "state":
+      session = self.get_session(request)
+      return {"player": session.player_grid.state, "enemy": session.AI_grid.fog_of_war}
+    if cmd == "stats":
+      if "session" in request: return latency_stats(self.get_session(request).latencies)
+      return latency_stats([latency for session in self.sessions.values() for latency in session.latencies])
+    if cmd == "close":
+      session = self.get_session(request)
+      del self.sessions[session.session_id]
+      if session.style_choice in OFFLOADED_STYLES: self.session_pool(session.session_id).submit(close_in_worker, session.session_id)
+      return {"closed": session.session_id}
+    raise ValueError(f"Unknown cmd {cmd!r}")
+
+  # Player strikes the AI's board, then the AI strikes the player's board
+  async def fire(self, session: Session, request: dict) -> dict:
+    row, col = int(request["row"]), int(request["col"])
+    if not (0 <= row < GRID_SIZE and 0 <= col < GRID_SIZE): raise ValueError(f"({row}, {col}) is not on the board")
+    async with session.lock:
+      if session.winner: raise ValueError(f"The game is over, {session.winner} won")
+      if session.AI_grid.board.is_shot(row, col): raise ValueError(f"({row}, {col}) was already struck")
+      start = time.perf_counter()
+      response = {"result": "hit" if session.AI_grid.fire(row, col) else "miss", "sunk": session.AI_grid.check_ship_sunk(),
+                  "ai_move": None, "ai_result": "", "ai_sunk": "", "winner": ""}
+      if len(session.AI_grid.ships_remaining) == 0:
+        session.winner = response["winner"] = "player"
+      else:
+        move = await self.choose_AI_move(session)
+        if move is not None:
+          hit = session.player_grid.apply_AI_move(session.style_choice, *move)
+          response["ai_move"] = list(move)
+          response["ai_result"] = "hit" if hit else "miss"
+        response["ai_sunk"] = session.player_grid.check_ship_sunk()
+        if len(session.player_grid.ships_remaining) == 0: session.winner = response["winner"] = "AI"
+      session.latencies.append(time.perf_counter() - start)
+      response["latency"] = session.latencies[-1]
+      return response
+
+  async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    task = asyncio.current_task()
+    self.clients.add(task)
+    try:
+      while line := await reader.readline():
+        try:
+          response = await self.handle(json.loads(line))
+        except Exception as error:
+          # A failing request (bad input or a strategy error) is answered, the connection and other sessions carry on
+          response = {"error": f"{type(error).__name__}: {error}"}
+        writer.write((json.dumps(response) + "\n").encode())
+        await writer.drain()
+    except ConnectionError:
+      pass
+    finally:
+      self.clients.discard(task)
+      writer.close()
+
+  async def serve(self, host: str = HOST, port: int = PORT):
+    return await asyncio.start_server(self.handle_client, host, port, limit=1 << 20)
+
+  def close(self) -> None:
+    if self.nn_batcher is not None: self.nn_batcher.cancel()
+    for pool in self.pools: pool.shutdown(cancel_futures=True)
+
+# p50 and p99 of a list of latencies in seconds
+def latency_stats(latencies) -> dict:
+  if len(latencies) == 0: return {"moves": 0, "p50": None, "p99": None}
+  return {"moves": len(latencies), "p50": float(np.percentile(latencies, 50)), "p99": float(np.percentile(latencies, 99))}
+
+# One client playing random moves in a new session until the game ends, returns the session's latencies
+async def play_client(host: str, port: int, ai_type: int) -> list[float]:
+  reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+  async def request(message: dict) -> dict:
+    writer.write((json.dumps(message) + "\n").encode())
+    await writer.drain()
+    return json.loads(await reader.readline())
+  session = (await request({"cmd": "new", "ai_type": ai_type}))["session"]
+  cells = [divmod(cell, GRID_SIZE) for cell in range(GRID_SIZE * GRID_SIZE)]
+  random.shuffle(cells)
+  latencies = []
+  for row, col in cells:
+    response = await request({"cmd": "fire", "session": session, "row": row, "col": col})
+    if "error" in response: break
+    latencies.append(response["latency"])
+    if response["winner"]: break
+  await request({"cmd": "close", "session": session})
+  writer.close()
+  await writer.wait_closed()
+  return latencies
+
+# Start a server and play sessions concurrent clients against it over localhost
+async def load_test(sessions: int = LOAD_TEST_SESSIONS, ai_type: int = LOAD_TEST_AI_TYPE, host: str = HOST, port: int = PORT) -> dict:
+  game_server = GameServer()
+  server = await game_server.serve(host, port)
+  start = time.perf_counter()
+  try:
+    session_latencies = await asyncio.gather(*(play_client(host, port, ai_type) for _ in range(sessions)))
+  finally:
+    server.close()
+    if game_server.clients: await asyncio.wait(game_server.clients, timeout=5)
+    await server.wait_closed()
+    game_server.close()
+  stats = latency_stats([latency for latencies in session_latencies for latency in latencies])
+  stats["sessions"] = sessions
+  stats["wall_time"] = time.perf_counter() - start
+  return stats
+
+async def main():
+  if LOAD_TEST:
+    print(await load_test())
+    return
+  game_server = GameServer()
+  server = await game_server.serve()
+  if PRELOAD_NETWORK: game_server.start_nn_batcher()
+  print(f"Battleship server listening on {HOST}:{PORT}")
+  try:
+    async with server:
+      await server.serve_forever()
+  finally:
+    game_server.close()
+
+if __name__ == "__main__":
+  asyncio.run(main())